@@ -0,0 +1,73 @@
+""" Latency benchmark of Trie.complete (trie_template.py) on a large vocabulary,
+with the per-node cache of top completions against ranking the whole subtree
+of the prefix, for prefixes of increasing length
+
+Run with the vocabulary size and optionally k, e.g.
+python autocomplete_benchmark.py 200000 10
+"""
+
+import random
+import sys
+import time
+
+from trie_template import Trie
+
+PREFIX_LENGTHS = [0, 1, 2, 3]
+QUERIES = 200
+
+
+def vocabulary(n, seed=0):
+    """ Returns n distinct random words with Zipf-like popularity scores """
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < n:
+        words.add("".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 10))))
+    words = sorted(words)
+    rng.shuffle(words)
+    return [(words[rank], n // (rank + 1)) for rank in range(n)]
+
+
+def build(entries, top_k):
+    """ Returns (trie with every entry inserted, seconds taken) """
+    start = time.perf_counter()
+    trie = Trie(top_k)
+    for word, score in entries:
+        trie.insert(word, score)
+    return trie, time.perf_counter() - start
+
+
+def latencies(trie, prefixes, k):
+    """ Returns the sorted latency in seconds of completing each prefix """
+    output = []
+    for prefix in prefixes:
+        start = time.perf_counter()
+        trie.complete(prefix, k)
+        output.append(time.perf_counter() - start)
+    return sorted(output)
+
+
+def autocomplete_benchmark(n, k=10):
+    """ Prints build time, then median and 99th percentile completion latency per prefix length """
+    entries = vocabulary(n)
+    cached, cached_seconds = build(entries, k)
+    uncached, uncached_seconds = build(entries, None)
+    print("vocabulary {}, k = {}".format(n, k))
+    print("build: cached {:.2f} s, uncached {:.2f} s".format(cached_seconds, uncached_seconds))
+
+    rng = random.Random(1)
+    print("{:>8} {:>10} {:>14} {:>14}".format("prefix", "trie", "median us", "p99 us"))
+    for length in PREFIX_LENGTHS:
+        prefixes = [rng.choice(entries)[0][:length] for _ in range(QUERIES)]
+        for name, trie in (("cached", cached), ("uncached", uncached)):
+            if name == "uncached" and length == 0:
+                # ranking the whole vocabulary once is enough to make the point
+                prefixes = prefixes[:3]
+            timings = latencies(trie, prefixes, k)
+            print("{:>8} {:>10} {:>14.1f} {:>14.1f}".format(
+                length, name, timings[len(timings) // 2] * 1e6, timings[len(timings) * 99 // 100] * 1e6))
+
+
+if __name__ == "__main__":
+    argv_n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    argv_k = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    autocomplete_benchmark(argv_n, argv_k)
@@ -0,0 +1,162 @@
+""" Benchmark harness comparing the exact matching engines of this repository:
+boyer_moore (boyer_moore/boyer_moore.py), Z-matching (z_algorithm.py) and
+suffix array search (suffix_array.py), over synthetic and adversarial corpora
+(random text, periodic "aaaa...", DNA-like 4 letter text) with short and long patterns.
+
+Every engine is run twice per workload: once untouched to time it, then once with
+tracemalloc and a MatchStatistics (match_statistics.py), to measure peak memory and
+the characters of the pattern compared against the text. Results are printed as JSON, one record per engine and workload,
+so they can be stored and compared to catch regressions.
+
+Run with the text length and optionally a file to write the JSON into, e.g.
+python benchmark.py 100000 bench_output.json
+"""
+
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "boyer_moore"))
+
+from boyer_moore import compile as compile_pattern, compile_cached
+from match_statistics import MatchStatistics
+from suffix_array import SuffixArrayIndex
+from z_algorithm import z_algorithm, z_match
+
+PATTERN_LENGTHS = {"short": 8, "long": 256}
+
+
+def random_text(n, alphabet="abcdefghijklmnopqrstuvwxyz", seed=0):
+    """ Returns a reproducible random string of length n over alphabet """
+    rng = random.Random(seed)
+    return "".join(rng.choice(alphabet) for _ in range(n))
+
+
+def random_corpus(n, seed=0):
+    return random_text(n, seed=seed)
+
+
+def periodic_corpus(n, seed=0):
+    return "a" * n
+
+
+def dna_corpus(n, seed=0):
+    return random_text(n, "acgt", seed)
+
+
+CORPORA = {"random": random_corpus, "periodic": periodic_corpus, "dna": dna_corpus}
+
+
+def boyer_moore_prepare(text, pattern):
+    return compile_pattern(pattern)
+
+
+def boyer_moore_search(state, text, pattern, stats=None):
+    return state.findall(text, stats)
+
+
+def z_match_prepare(text, pattern):
+    return z_algorithm(pattern)
+
+
+def z_match_search(state, text, pattern, stats=None):
+    return list(z_match(pattern, text, state, stats))
+
+
+def suffix_array_prepare(text, pattern):
+    return SuffixArrayIndex(text)
+
+
+def suffix_array_search(state, text, pattern, stats=None):
+    return state.locate(pattern, stats)
+
+
+# engine name: (preprocessing, which is not part of the search throughput, search)
+ENGINES = {
+    "boyer_moore": (boyer_moore_prepare, boyer_moore_search),
+    "z_match": (z_match_prepare, z_match_search),
+    "suffix_array": (suffix_array_prepare, suffix_array_search),
+}
+
+
+def run_engine(engine, text, pattern):
+    """ Returns (matches, preprocessing seconds, search seconds) of one engine """
+    prepare, search = ENGINES[engine]
+    compile_cached.cache_clear()
+
+    start = time.perf_counter()
+    state = prepare(text, pattern)
+    prepare_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matches = search(state, text, pattern)
+    search_seconds = time.perf_counter() - start
+    return matches, prepare_seconds, search_seconds
+
+
+def measure_engine(engine, text, pattern):
+    """ Returns (peak bytes allocated, characters compared during the search) of one engine """
+    prepare, search = ENGINES[engine]
+    compile_cached.cache_clear()
+    stats = MatchStatistics()
+
+    tracemalloc.start()
+    state = prepare(text, pattern)
+    search(state, text, pattern, stats)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, stats.total("comparisons")
+
+
+def benchmark(n):
+    """ Runs every engine on every corpus and pattern length, checks that the engines agree,
+    and returns the list of result records
+    """
+    records = []
+    for corpus_name, corpus in CORPORA.items():
+        text = corpus(n)
+        for pattern_name, m in PATTERN_LENGTHS.items():
+            # a pattern copied from the middle of the text, so it occurs at least once
+            pattern = text[n // 2:n // 2 + m]
+            expected = None
+            for engine in ENGINES:
+                matches, prepare_seconds, search_seconds = run_engine(engine, text, pattern)
+                if expected is None:
+                    expected = matches
+                elif matches != expected:
+                    raise Exception(engine + " disagrees on " + corpus_name + " with a " + pattern_name + " pattern")
+
+                peak_memory, comparisons = measure_engine(engine, text, pattern)
+                records.append({
+                    "engine": engine,
+                    "corpus": corpus_name,
+                    "pattern": pattern_name,
+                    "text_length": n,
+                    "pattern_length": m,
+                    "matches": len(matches),
+                    "prepare_seconds": prepare_seconds,
+                    "search_seconds": search_seconds,
+                    "chars_per_second": n / search_seconds if search_seconds > 0 else None,
+                    "char_comparisons": comparisons,
+                    "peak_memory_bytes": peak_memory,
+                })
+    return records
+
+
+def benchmark_driver(n, file_name=None):
+    """ Runs the benchmark and writes its JSON into file_name, or prints it if no file is given """
+    output = json.dumps(benchmark(n), indent=2)
+    if file_name is None:
+        print(output)
+    else:
+        with open(file_name, "w") as output_file:
+            output_file.write(output)
+
+
+if __name__ == "__main__":
+    argv_n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    argv_file = sys.argv[2] if len(sys.argv) > 2 else None
+    benchmark_driver(argv_n, argv_file)
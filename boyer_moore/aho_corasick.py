@@ -0,0 +1,101 @@
+""" Aho-Corasick's multi-pattern matching algorithm, which finds every occurrence of many patterns
+in a single pass over the text, instead of one boyer_moore pass per pattern """
+
+from collections import deque
+
+
+class AhoCorasick:
+    """ Automaton over a trie of the patterns, with instance variables:
+    self.goto: for every state, a dictionary from character to child state
+    self.fail: for every state, the state of its longest proper suffix that is also in the trie
+    self.output: for every state, the index of the pattern ending there, or None
+    self.output_link: for every state, the nearest state on its fail chain with an output, or None
+    """
+
+    def __init__(self, patterns):
+        """ Builds the trie of the patterns, then the fail and output links breadth first
+
+        :time complexity: O(M), where M is the total length of the patterns
+        :space complexity: O(M)
+        """
+        self.patterns = list(patterns)
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [None]
+        self.output_link = [None]
+
+        for index in range(len(self.patterns)):
+            self.insert(self.patterns[index], index)
+        self.build_links()
+
+    def insert(self, pattern, index):
+        """ Adds pattern into the trie, marking its last state with index """
+        if len(pattern) == 0:
+            raise Exception("Patterns must not be empty")
+        state = 0
+        for char in pattern:
+            if char not in self.goto[state]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append(None)
+                self.output_link.append(None)
+                self.goto[state][char] = len(self.goto) - 1
+            state = self.goto[state][char]
+        if self.output[state] is None:
+            self.output[state] = index
+
+    def build_links(self):
+        """ Sets the fail and output links of every state in breadth first order,
+        so the links of shallower states are ready when deeper states need them
+
+        :time complexity: O(M), where M is the total length of the patterns
+        """
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                fallback = self.fail[state]
+                while fallback > 0 and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+
+                suffix = self.fail[child]
+                self.output_link[child] = suffix if self.output[suffix] is not None else self.output_link[suffix]
+                queue.append(child)
+
+    def finditer(self, text):
+        """ Yields (start index, pattern index) for every occurrence of every pattern in text,
+        in order of the end of the occurrence
+
+        :time complexity: O(n + k), where n is the length of text and k is the number of occurrences
+        :space complexity: O(1)
+        """
+        state = 0
+        for i in range(len(text)):
+            char = text[i]
+            while state > 0 and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+
+            match = state if self.output[state] is not None else self.output_link[state]
+            while match is not None:
+                index = self.output[match]
+                yield i - len(self.patterns[index]) + 1, index
+                match = self.output_link[match]
+
+    def search(self, text):
+        """ Returns a dictionary from each pattern to the list of indices where it occurs in text,
+        the same as calling boyer_moore(pattern, text) for every pattern. Occurrences of one
+        pattern are found in order of their end, so the lists come out sorted
+
+        :time complexity: O(n + k), where n is the length of text and k is the number of occurrences
+        """
+        matches = {pattern: [] for pattern in self.patterns}
+        for start, index in self.finditer(text):
+            matches[self.patterns[index]].append(start)
+        return matches
+
+
+def aho_corasick(patterns, text):
+    """ Builds the automaton of patterns and searches text with it in one pass """
+    return AhoCorasick(patterns).search(text)
@@ -0,0 +1,53 @@
+""" Benchmark of the dense bad character array against SparseBadCharacter,
+reporting the memory and time of preprocessing and the time of a search for
+patterns of increasing length
+
+Run with the pattern lengths as arguments, e.g.
+python bad_character_benchmark.py 10 100 1000 10000
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import random_text
+from boyer_moore import boyer_moore, preprocess
+
+DEFAULT_LENGTHS = [10, 100, 1000, 10000]
+TEXT_LENGTH = 100000
+
+
+def measure(pattern, text, sparse):
+    """ Returns (bytes allocated by preprocessing, preprocessing seconds, search seconds) """
+    tracemalloc.start()
+    start = time.perf_counter()
+    tables = preprocess(pattern, sparse)
+    preprocess_seconds = time.perf_counter() - start
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    boyer_moore(pattern, text, tables)
+    search_seconds = time.perf_counter() - start
+    return allocated, preprocess_seconds, search_seconds
+
+
+def bad_character_benchmark(lengths):
+    """ Prints memory and latency of both bad character representations for each pattern length """
+    text = random_text(TEXT_LENGTH)
+    print("{:>8} {:>8} {:>14} {:>16} {:>12}".format("m", "table", "preprocess KB", "preprocess ms", "search ms"))
+    for m in lengths:
+        # patterns over fewer letters than the text, so most shifts come from the bad character rule
+        pattern = random_text(m, alphabet="abcd", seed=m)
+        for sparse in (False, True):
+            allocated, preprocess_seconds, search_seconds = measure(pattern, text, sparse)
+            print("{:>8} {:>8} {:>14.1f} {:>16.3f} {:>12.3f}".format(
+                m, "sparse" if sparse else "dense", allocated / 1024,
+                preprocess_seconds * 1000, search_seconds * 1000))
+
+
+if __name__ == "__main__":
+    bad_character_benchmark([int(arg) for arg in sys.argv[1:]] or DEFAULT_LENGTHS)
@@ -1,4 +1,12 @@
-""" Boyer moore's linear time pattern matching algorithm with the bad character rule, good suffix rule, match prefix rule and galil's optimization """
+""" Boyer moore's linear time pattern matching algorithm with the bad character rule, good suffix rule, match prefix rule and galil's optimization
+
+Patterns and texts are either both lowercase strings, or both bytes-like objects (bytes, bytearray, mmap or memoryview),
+which are searched over the 256 byte values in place, without decoding or copying the text.
+"""
+
+import mmap
+from bisect import bisect_left
+from functools import lru_cache
 
 from reverse_z import z_suffix
 from z_algo import z_algorithm
@@ -24,6 +32,70 @@ def bad_character_preprocess(pattern, alphabet_size):
     return bad_char_array
 
 
+class SparseBadCharacter:
+    """ Extended bad character rule stored as a sorted list of positions for each character
+    of the pattern, instead of bad_character_preprocess's alphabet_size*len(pattern) array.
+    Works for any characters, not only lowercase letters.
+
+    :space complexity: O(s + m), where s is the number of distinct characters in the pattern
+    and m is the length of the pattern
+    """
+
+    def __init__(self, pattern):
+        """ :time complexity: O(m), where m is the length of the pattern """
+        self.positions = {}
+        for i in range(len(pattern)):
+            if pattern[i] not in self.positions:
+                self.positions[pattern[i]] = []
+            self.positions[pattern[i]].append(i)
+
+    def value(self, char, position):
+        """ Returns the same value as bad_character_preprocess(...)[char][position] for a mismatch
+        at position: 1 + the position of the rightmost char on the left of position, or 0 if none
+
+        :time complexity: O(log m), where m is the length of the pattern
+        """
+        positions = self.positions_of(char)
+        if positions is None:
+            return 0
+        index = bisect_left(positions, position)
+        return positions[index - 1] + 1 if index > 0 else 0
+
+    def positions_of(self, char):
+        """ Returns the sorted positions of char in the pattern, None if it does not occur """
+        return self.positions.get(char)
+
+
+class ByteBadCharacter(SparseBadCharacter):
+    """ SparseBadCharacter for bytes-like patterns, where the positions of each of the
+    256 byte values are found by indexing a list rather than hashing
+
+    :space complexity: O(256 + m), where m is the length of the pattern
+    """
+
+    def __init__(self, pattern):
+        """ :time complexity: O(256 + m), where m is the length of the pattern """
+        self.positions = [None] * 256
+        for i in range(len(pattern)):
+            if self.positions[pattern[i]] is None:
+                self.positions[pattern[i]] = []
+            self.positions[pattern[i]].append(i)
+
+    def positions_of(self, char):
+        return self.positions[char]
+
+
+def byte_view(data):
+    """ Returns data unchanged if it is a str, bytes, bytearray or mmap, which all index
+    to single characters or byte values, otherwise a memoryview of its raw bytes
+
+    :time complexity: O(1), since nothing is copied
+    """
+    if isinstance(data, (str, bytes, bytearray, mmap.mmap)):
+        return data
+    return memoryview(data).cast("B")
+
+
 def good_suffix_preprocess(z_suffix_array):
     """ Returns an array whereby each position i + 1 contains an offset value that determines
     the safe good suffix shift when a mismatch occurs at position i in the pattern
@@ -69,7 +141,7 @@ def galil_comparison(pattern, text, align_end_index, pattern_start, pattern_stop
     # compare characters from align_end_index (inclusive) to pattern_stop (exclusive)
     text_index = align_end_index
     pattern_index = len(pattern) - 1
-    right_value, comparisons = compare(pattern, text, text_index, pattern_index, pattern_stop)
+    right_value = compare(pattern, text, text_index, pattern_index, pattern_stop)
     if right_value is not None:
         return right_value
 
@@ -90,56 +162,199 @@ def compare(pattern, text, text_index, pattern_index, stop):
     return None
 
 
-def boyer_moore(pattern, text):
+def preprocess(pattern, sparse=False):
+    """ Returns the bad character, good suffix and match prefix arrays of pattern.
+    The bad character rule uses SparseBadCharacter if sparse is True, which needs
+    far less memory for long patterns at the cost of a binary search per shift,
+    and ByteBadCharacter for bytes-like patterns
+
+    :time complexity: O(m)
+    :space complexity: O(m), where m is the length of pattern
+    """
+    pattern = byte_view(pattern)
+    if not isinstance(pattern, str):
+        bad_character_array = ByteBadCharacter(pattern)
+    elif sparse:
+        bad_character_array = SparseBadCharacter(pattern)
+    else:
+        bad_character_array = bad_character_preprocess(pattern, 26)
+    good_suffix_array = good_suffix_preprocess(z_suffix(pattern))
+    match_prefix_array = match_prefix_preprocess(z_algorithm(pattern))
+    return bad_character_array, good_suffix_array, match_prefix_array
+
+
+def boyer_moore(pattern, text, tables=None, sparse=False, stats=None):
     """ Performs boyer moore's algorithm and returns a list of indices where the matches occur.
+    tables can be given to reuse the result of preprocess(pattern) across calls,
+    otherwise they are built with preprocess(pattern, sparse).
+    stats, e.g. a match_statistics.MatchStatistics, records comparisons and shifts if given.
     
     :time complexity: O(n+m) OR O(n/m) armotized
     :space complexity: O(n+m) where n is the length of pattern and m is the length of pattern
     """
+    if tables is None:
+        tables = preprocess(pattern, sparse)
+    return list(iterate_matches(pattern, text, tables, stats))
+
+
+def iterate_matches(pattern, text, tables, stats=None):
+    """ Generator version of boyer_moore, which yields the index of each match
+    as soon as it is found, given the result of preprocess(pattern)
+
+    :time complexity: O(n+m) OR O(n/m) armotized
+    :space complexity: O(1) on top of tables
+    """
+    pattern = byte_view(pattern)
+    text = byte_view(text)
     m = len(pattern)
-    bad_character_array = bad_character_preprocess(pattern, 26)
-    good_suffix_array = good_suffix_preprocess(z_suffix(pattern))
-    match_prefix_array = match_prefix_preprocess(z_algorithm(pattern))
+    bad_character_array, good_suffix_array, match_prefix_array = tables
+    sparse = isinstance(bad_character_array, SparseBadCharacter)
 
-    output = []
     start = stop = len(pattern)
     pointer = len(pattern) - 1
     while pointer < len(text):
         mismatch = galil_comparison(pattern, text, pointer, start, stop)
+        if stats is not None:
+            record_comparisons(stats, pointer, pointer - m + 1 if mismatch is None else mismatch, start, stop)
       
         if mismatch is not None:
             mismatch_at_pattern = m - (pointer - mismatch) - 1
 
             # check bad character shift
-            bad_character_index = ord(text[mismatch]) - 97
-            bad_character_value = bad_character_array[bad_character_index][mismatch_at_pattern]
+            if sparse:
+                bad_character_value = bad_character_array.value(text[mismatch], mismatch_at_pattern)
+            else:
+                bad_character_index = ord(text[mismatch]) - 97
+                bad_character_value = bad_character_array[bad_character_index][mismatch_at_pattern]
             bad_character_shift = max(1, mismatch_at_pattern - bad_character_value + 1)
 
             # check good suffix shift
             good_suffix_value = good_suffix_array[mismatch_at_pattern + 1]
             if good_suffix_value > -1:
                 good_suffix_shift = m - good_suffix_value - 1
+                # the matched good suffix lands on its other occurrence in the pattern
+                skip_start = mismatch + 1
             else:
                 # no good suffix, hence check prefix matching
                 match_prefix_value = match_prefix_array[mismatch_at_pattern + 1]
                 good_suffix_shift = m - match_prefix_value
+                # only the part of the good suffix that is also a prefix lands on the pattern
+                skip_start = pointer - match_prefix_value + 1
 
-            start = mismatch + 1
-            stop = pointer
-            pointer += max(good_suffix_shift, bad_character_shift)
+            # galil's optimization is only safe when the good suffix rule decides the shift
+            if good_suffix_shift >= bad_character_shift:
+                if stats is not None:
+                    rule = "shift_good_suffix" if good_suffix_value > -1 else "shift_match_prefix"
+                    stats.record(rule, pointer, good_suffix_shift)
+                start = skip_start
+                stop = pointer
+                pointer += good_suffix_shift
+            else:
+                if stats is not None:
+                    stats.record("shift_bad_character", pointer, bad_character_shift)
+                pointer += bad_character_shift
+                start = stop = pointer + 1
 
         else:
             # all match, hence shift using prefix matching
-            output += [pointer - m + 1]
+            yield pointer - m + 1
             good_suffix_shift = m - match_prefix_array[1]
+            if stats is not None:
+                stats.record("match", pointer - m + 1)
+                stats.record("shift_after_match", pointer, good_suffix_shift)
 
-            stop = start = pointer
+            # galil's optimization: the longest border of the pattern is known to match
+            start = pointer - match_prefix_array[1] + 1
+            stop = pointer
             pointer += good_suffix_shift
 
-    return output
 
+def record_comparisons(stats, pointer, lowest, start, stop):
+    """ Records the number of characters galil_comparison compared for the alignment ending at
+    pointer: every text position from lowest (the mismatch, or the start of the alignment)
+    to pointer, except those skipped by galil's optimization in [start, stop]
+    """
+    skipped = max(0, min(stop, pointer) - max(start, lowest) + 1)
+    stats.record("comparisons", pointer, pointer - lowest + 1 - skipped)
+
+
+def boyer_moore_stream(pattern, chunks, tables=None):
+    """ Performs boyer moore's algorithm over text arriving as an iterable of chunks
+    (e.g. from read_chunks) and yields the index in the whole text of every match.
+    The last len(pattern) - 1 characters of each chunk are kept and searched again
+    with the next chunk, so matches across chunk boundaries are found exactly once.
+
+    :time complexity: O(n+m) OR O(n/m) armotized, where n is the total length of the chunks
+    :space complexity: O(c+m), where c is the length of the largest chunk
+    """
+    if tables is None:
+        tables = preprocess(pattern)
+    overlap = len(pattern) - 1
+    tail = None
+    offset = 0  # index in the whole text of the start of buffer
+
+    for chunk in chunks:
+        buffer = chunk if tail is None else tail + chunk
+        for index in iterate_matches(pattern, buffer, tables):
+            yield offset + index
+
+        # a match cannot fit entirely in the kept overlap, so none is reported twice
+        keep = min(overlap, len(buffer))
+        tail = buffer[len(buffer) - keep:]
+        if not isinstance(tail, str):
+            tail = bytes(tail)  # so that it can be joined to any bytes-like chunk
+        offset += len(buffer) - keep
+
+
+def read_chunks(file_name, chunk_size=1 << 20, binary=False):
+    """ Yields the contents of a file chunk_size characters (or bytes if binary is True) at a time """
+    with open(file_name, "rb" if binary else "r") as text_file:
+        chunk = text_file.read(chunk_size)
+        while chunk:
+            yield chunk
+            chunk = text_file.read(chunk_size)
+
+
+class BoyerMoorePattern:
+    """ A pattern together with its preprocessed arrays, like a compiled regular expression,
+    so that searching it in many texts only preprocesses it once. Obtain it from compile
+    """
+
+    def __init__(self, pattern, sparse=False):
+        self.pattern = pattern
+        self.tables = preprocess(pattern, sparse)
+
+    def finditer(self, text, stats=None):
+        """ Yields the index of each match in text """
+        return iterate_matches(self.pattern, text, self.tables, stats)
+
+    def findall(self, text, stats=None):
+        """ Returns a list of indices where the matches occur in text, same as boyer_moore """
+        return list(self.finditer(text, stats))
 
+    def search(self, text, stats=None):
+        """ Returns the index of the first match in text, or None if there is none
 
+        :time complexity: O(k+m), where k is the index of the first match
+        """
+        return next(self.finditer(text, stats), None)
 
+    def stream(self, chunks):
+        """ Yields the index of each match in text arriving as chunks, same as boyer_moore_stream """
+        return boyer_moore_stream(self.pattern, chunks, self.tables)
+
+
+def compile(pattern, sparse=False):
+    """ Returns the BoyerMoorePattern of pattern. The most recently used patterns are cached,
+    so a hot pattern is only preprocessed once per process. Bytes-like patterns are cached
+    as bytes, since a bytearray or memoryview cannot be a cache key
+    """
+    if not isinstance(pattern, (str, bytes)):
+        pattern = bytes(byte_view(pattern))
+    return compile_cached(pattern, sparse)
 
 
+@lru_cache(maxsize=256)
+def compile_cached(pattern, sparse=False):
+    """ Cached part of compile, for a str or bytes pattern """
+    return BoyerMoorePattern(pattern, sparse)
@@ -0,0 +1,59 @@
+""" Benchmark of searching many patterns at once with aho_corasick,
+against looping over boyer_moore once per pattern
+
+Run with the text length and the number of patterns as arguments, e.g.
+python multi_pattern_benchmark.py 100000 200
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aho_corasick import aho_corasick
+from benchmark import random_text
+from boyer_moore import boyer_moore
+
+
+def sample_patterns(text, num_patterns, length, seed=1):
+    """ Returns num_patterns distinct patterns, half copied from text so that
+    they match, and half random so that most of them do not
+    """
+    rng = random.Random(seed)
+    patterns = set()
+    while len(patterns) < num_patterns:
+        if len(patterns) % 2 == 0:
+            start = rng.randrange(len(text) - length + 1)
+            patterns.add(text[start:start + length])
+        else:
+            patterns.add(random_text(length, seed=rng.random()))
+    return list(patterns)
+
+
+def multi_pattern_benchmark(n, num_patterns, length=8):
+    """ Prints the time taken by both approaches and checks that they agree """
+    text = random_text(n)
+    patterns = sample_patterns(text, num_patterns, length)
+
+    start = time.perf_counter()
+    looped = {pattern: boyer_moore(pattern, text) for pattern in patterns}
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    single_pass = aho_corasick(patterns, text)
+    single_pass_seconds = time.perf_counter() - start
+
+    if looped != single_pass:
+        raise Exception("aho_corasick and boyer_moore disagree")
+
+    print("text length {}, {} patterns of length {}".format(n, num_patterns, length))
+    print("{:>14} {:>10.3f} s".format("boyer_moore", loop_seconds))
+    print("{:>14} {:>10.3f} s".format("aho_corasick", single_pass_seconds))
+
+
+if __name__ == "__main__":
+    argv_n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    argv_patterns = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    multi_pattern_benchmark(argv_n, argv_patterns)
@@ -0,0 +1,123 @@
+""" Parallel boyer moore search, which splits a large text into shards that are searched
+by a pool of processes with the compiled pattern.
+
+Shards overlap by len(pattern) - 1 characters so that matches crossing a boundary are found,
+and each shard only reports matches starting inside it, so none is reported twice.
+Workers never receive the text itself: they attach to it by name, either by mapping
+the same file with mmap, or by attaching to a block of shared memory.
+
+Run with the pattern, the file and optionally the number of workers, e.g.
+python parallel_boyer_moore.py needle big_file.txt 8
+"""
+
+import mmap
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+from boyer_moore import byte_view, compile
+
+MIN_SHARD_SIZE = 1 << 16
+
+
+def shard_bounds(n, m, num_shards):
+    """ Returns (start, stop) of each shard, where a shard searches text[start:stop + m - 1]
+    for matches starting in [start, stop)
+
+    :time complexity: O(s), where s is the number of shards
+    """
+    last_start = n - m + 1  # no match can start after this
+    if last_start <= 0:
+        return []
+    shard_size = -(-last_start // num_shards)
+    return [(start, min(start + shard_size, last_start)) for start in range(0, last_start, shard_size)]
+
+
+def search_shard(pattern, source, start, stop):
+    """ Worker: attaches to the text described by source, either ("file", file name)
+    or ("shared_memory", block name), and returns the indices of matches starting in [start, stop)
+
+    :time complexity: O(k+m) OR O(k/m) armotized, where k is the length of the shard
+    """
+    kind, name = source
+    if kind == "file":
+        with open(name, "rb") as text_file:
+            buffer = mmap.mmap(text_file.fileno(), 0, access=mmap.ACCESS_READ)
+    else:
+        # pool processes share the parent's resource tracker, which unlinks the block only once
+        buffer = SharedMemory(name=name)
+
+    view = memoryview(buffer if kind == "file" else buffer.buf)
+    shard = view[start:stop + len(pattern) - 1]
+    try:
+        return [start + index for index in compile(pattern).findall(shard)]
+    finally:
+        shard.release()
+        view.release()
+        buffer.close()
+
+
+def parallel_search(pattern, source, n, workers=None, num_shards=None):
+    """ Searches the text of length n described by source in shards over a process pool,
+    and returns the sorted indices of all matches
+
+    :time complexity: O((n+m) / w) with w workers, plus O(k) to merge k matches
+    """
+    workers = workers or os.cpu_count() or 1
+    if num_shards is None:
+        # a few shards per worker balances uneven shards without much per-task overhead
+        num_shards = max(1, min(workers * 4, n // MIN_SHARD_SIZE))
+
+    output = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(search_shard, pattern, source, start, stop)
+                   for start, stop in shard_bounds(n, len(pattern), num_shards)]
+        # shards are in order and disjoint, so concatenating keeps the output sorted and unique
+        for future in futures:
+            output += future.result()
+    return output
+
+
+def parallel_boyer_moore_file(pattern, file_name, workers=None, num_shards=None):
+    """ Returns the sorted indices of every match of pattern (bytes, or a str encoded as
+    latin-1) in the bytes of a file, which every worker maps with mmap
+    """
+    if isinstance(pattern, str):
+        pattern = pattern.encode("latin-1")
+    n = os.path.getsize(file_name)
+    return parallel_search(bytes(pattern), ("file", file_name), n, workers, num_shards)
+
+
+def parallel_boyer_moore(pattern, text, workers=None, num_shards=None):
+    """ Returns the sorted indices of every match of pattern in text, a bytes-like object
+    (or a str pattern and text, encoded as latin-1). The text is copied once into
+    shared memory, which every worker attaches to instead of receiving a pickled copy
+    """
+    if isinstance(text, str):
+        text = text.encode("latin-1")
+        pattern = pattern.encode("latin-1")
+    text = byte_view(text)
+
+    shared = SharedMemory(create=True, size=max(len(text), 1))
+    try:
+        shared.buf[:len(text)] = text
+        return parallel_search(bytes(pattern), ("shared_memory", shared.name), len(text), workers, num_shards)
+    finally:
+        shared.close()
+        shared.unlink()
+
+
+def parallel_boyer_moore_driver(pattern, file_name, workers=None):
+    """ Searches pattern in the specified file in parallel and writes the
+    index of every match into output_parallel_boyer_moore.txt
+    """
+    output = parallel_boyer_moore_file(pattern, file_name, workers)
+
+    with open("output_parallel_boyer_moore.txt", "w") as output_file:
+        output_file.write("\n".join(str(index) for index in output))
+
+
+if __name__ == "__main__":
+    argv_workers = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    parallel_boyer_moore_driver(sys.argv[1], sys.argv[2], argv_workers)
@@ -1,8 +1,9 @@
 
-def z_suffix(string):
+def z_suffix(string, stats=None):
     """ Returns a z_array, such that for all i, z_array[i] contains
     the length of the longest substring starting at position i to the
-    start of the string that matches string's suffix
+    start of the string that matches string's suffix. stats, e.g. a
+    match_statistics.MatchStatistics, records comparisons and Z-box reuses if given
 
     :time complexity: O(n)
     :space complexity: O(n), where n is the length of the string
@@ -18,19 +19,28 @@ def z_suffix(string):
         if index < left:
             left, right, counter = z_character_comparison(string, index, left, right, 0)
             z_array[index] = counter
+            if stats is not None:
+                record_comparisons(stats, index, counter)
         # when index is in the current Z-box
         else:
             remaining = index - left + 1
             reference_index = len(string) - (right - index) - 1
             if z_array[reference_index] < remaining:
                 z_array[index] = z_array[reference_index]
+                if stats is not None:
+                    stats.record("z_box_reuse", index)
             elif z_array[reference_index] > remaining:
                 z_array[index] = remaining
+                if stats is not None:
+                    stats.record("z_box_reuse", index)
             else:
                 # explicit comparisons starting from the left - 1
                 number_known_same_char = index - left + 1
-                left, right, counter = z_character_comparison(string, left - 1, left, right, number_known_same_char)
+                pointer = left - 1
+                left, right, counter = z_character_comparison(string, pointer, left, right, number_known_same_char)
                 z_array[index] = counter
+                if stats is not None:
+                    record_comparisons(stats, pointer, counter - number_known_same_char)
         index -= 1
 
     return z_array
@@ -59,4 +69,8 @@ def z_character_comparison(string, pointer, left, right, number_known_same_char)
     return left, right, counter
 
 
-
+def record_comparisons(stats, pointer, matched):
+    """ Records the comparisons of an explicit comparison that started at pointer and moved left
+    over matched characters: one per matched character, plus the mismatch unless it ran off the start
+    """
+    stats.record("comparisons", pointer, matched + (1 if pointer - matched >= 0 else 0))
@@ -0,0 +1,60 @@
+""" Reading and writing the binary files of suffix_array.py (save_index, MappedSuffixArrayIndex)
+and trie_file.py (save_trie, TrieFile): a header followed by fixed width little-endian arrays,
+each padded to a multiple of 8 bytes. Arrays are written with write_padded and read back
+from a MappedFile, which maps the file with mmap so nothing is copied or parsed.
+"""
+
+import mmap
+import sys
+from array import array
+
+
+def little_endian(values):
+    """ Returns the bytes of an array in little-endian order """
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def write_padded(output_file, data):
+    """ Writes data followed by zeros up to the next multiple of 8 bytes """
+    output_file.write(data)
+    output_file.write(bytes(-len(data) % 8))
+
+
+class MappedFile:
+    """ A file mapped read-only with mmap. self.buffer is a memoryview of the whole file,
+    for reading its header, and view reads the arrays that follow it
+    """
+
+    def __init__(self, file_name):
+        """ Maps the file
+        :time complexity: O(1)
+        """
+        with open(file_name, "rb") as input_file:
+            self.mapping = mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.buffer = memoryview(self.mapping)
+        self.views = []
+
+    def view(self, offset, count, typecode):
+        """ Returns (array of count items of typecode at offset, offset of the next padded section).
+        The array is a zero-copy memoryview on little-endian machines, and a byte-swapped copy otherwise
+        """
+        size = count * array(typecode).itemsize
+        section = self.buffer[offset:offset + size]
+        if sys.byteorder == "little" or array(typecode).itemsize == 1:
+            values = section.cast(typecode)
+            self.views.append(values)
+        else:
+            values = array(typecode, section.tobytes())
+            values.byteswap()
+        section.release()
+        return values, offset + size + (-size % 8)
+
+    def close(self):
+        """ Releases every view into the mapping, then unmaps the file """
+        for values in self.views:
+            values.release()
+        self.buffer.release()
+        self.mapping.close()
@@ -0,0 +1,44 @@
+""" Instrumentation for the string matchers in boyer_moore/, z_algorithm.py and suffix_array.py
+
+Matchers take an optional stats argument. When it is None (the default) they only pay
+for one None check per shift or explicit comparison; otherwise they call stats.record
+for every event, and a MatchStatistics accumulates them.
+
+Events recorded by boyer_moore: "comparisons" (characters compared per alignment),
+"match", and the shift of each alignment under the rule that decided it:
+"shift_bad_character", "shift_good_suffix", "shift_match_prefix" and "shift_after_match".
+Events recorded by the Z functions: "comparisons" and "z_box_reuse"
+(values copied from inside a Z-box without any comparison).
+SuffixArrayIndex in suffix_array.py records "comparisons" of the pattern against
+the text during its binary search.
+"""
+
+
+class MatchStatistics:
+    """ Counts how many times each event occurred and the total of its amounts,
+    e.g. for "shift_good_suffix" the number of such shifts and their total length,
+    and passes every event to callback(event, position, amount) if one is given
+    """
+
+    def __init__(self, callback=None):
+        self.counts = {}
+        self.totals = {}
+        self.callback = callback
+
+    def record(self, event, position, amount=1):
+        """ Records one event at position (an index of the text or string) with an amount """
+        self.counts[event] = self.counts.get(event, 0) + 1
+        self.totals[event] = self.totals.get(event, 0) + amount
+        if self.callback is not None:
+            self.callback(event, position, amount)
+
+    def count(self, event):
+        """ Returns the number of times event was recorded """
+        return self.counts.get(event, 0)
+
+    def total(self, event):
+        """ Returns the sum of the amounts recorded with event """
+        return self.totals.get(event, 0)
+
+    def __repr__(self):
+        return "MatchStatistics(counts=" + repr(self.counts) + ", totals=" + repr(self.totals) + ")"
@@ -1,28 +1,87 @@
 """ This file contains a suffix array generator.
-The suffix array is obtained by building a suffix tree (with ukkonen's algorithm) then traversing it.
+The suffix array is obtained either by building a suffix tree (with ukkonen's algorithm) then traversing it,
+or directly with the SA-IS algorithm, which skips the tree entirely and needs far less memory.
 """
 
+import struct
 import sys
+from array import array
 
+from mapped_file import MappedFile, little_endian, write_padded
 
-class Node:
-    ALPHABET_OFFSET = 97
 
-    def __init__(self, node_id=None, alpha_size=26):
-        """ Default alphabet set includes ASCII characters a - z, with special terminal symbol $ """
-        self.edges = [None] * (alpha_size + 1)
+class Alphabet:
+    """ Maps every character of a text (a str of any Unicode characters, or bytes) to a dense
+    rank 1..c in sorted order, with rank 0 reserved for the special terminal symbol $,
+    so suffix structures index small integers whatever the input characters are
+    """
+
+    def __init__(self, characters=""):
+        """ Ranks the distinct characters of characters, typically the text itself
+
+        :time complexity: O(n + c log c), where n is the length of characters
+        and c is the number of distinct characters
+        """
+        self.ranks = {char: rank + 1 for rank, char in enumerate(sorted(set(characters)))}
+
+    def __len__(self):
+        """ Returns the number of ranks, including the terminal symbol """
+        return len(self.ranks) + 1
+
+    def rank(self, char):
+        if char not in self.ranks:
+            raise Exception(repr(char) + " is not in the alphabet")
+        return self.ranks[char]
+
+    def encode(self, text):
+        """ Returns text as an array of ranks, followed by the terminal symbol
+
+        :time complexity: O(n), where n is the length of the text
+        """
+        encoded = array("i", [self.rank(char) for char in text])
+        encoded.append(0)
+        return encoded
+
+
+class ByteAlphabet(Alphabet):
+    """ Fixed alphabet of all 256 byte values, where byte b has rank b + 1,
+    for bytes, bytearray, mmap or memoryview input without scanning it first
+    """
+
+    def __init__(self):
+        Alphabet.__init__(self)
+
+    def __len__(self):
+        return 257
+
+    def rank(self, char):
+        return char + 1
+
+    def encode(self, text):
+        encoded = array("i", [byte + 1 for byte in memoryview(text).cast("B")])
+        encoded.append(0)
+        return encoded
+
+
+class Node:
+    def __init__(self, node_id=None):
+        """ Edges are kept in a dictionary keyed by the rank of their first character,
+        so a node only stores the children it has, whatever the alphabet size
+        """
+        self.edges = {}
         self.leaf = True
         self.id = node_id
+        self.suffix_link = None
 
     def get_edge(self, character):
-        """ Given a character, returns edge that links up to the corresponding child node """
-        return self.edges[Node.calc_index(character)]
+        """ Given a character rank, returns edge that links up to the corresponding child node """
+        return self.edges.get(character)
 
     def connect(self, character, text_start, text_end, node_id):
         """ Adds a new edge that links up to another node corresponding to character specified """
         new_node = Node(node_id)
         new_edge = Edge(text_start, text_end, new_node)
-        self.edges[Node.calc_index(character)] = new_edge
+        self.edges[character] = new_edge
         self.leaf = False
 
     def set_id(self, new_id):
@@ -31,17 +90,18 @@ class Node:
     def get_id(self):
         return self.id
 
+    def set_suffix_link(self, node):
+        self.suffix_link = node
+
+    def get_suffix_link(self):
+        return self.suffix_link
+
     def is_leaf(self):
         return self.leaf
 
     def set_not_leaf(self):
         self.leaf = False
 
-    @staticmethod
-    def calc_index(char):
-        """ Given a character, returns its corresponding index for the edges array """
-        return 0 if char == "$" else ord(char) - Node.ALPHABET_OFFSET + 1
-
 
 class Edge:
     def __init__(self, text_start, text_end, next_node):
@@ -68,7 +128,7 @@ class Edge:
         # links internal node with the remaining edge
         internal_node = Node()
         internal_node.set_not_leaf()
-        internal_node.edges[Node.calc_index(character)] = remaining_edge
+        internal_node.edges[character] = remaining_edge
         self.next = internal_node
 
         return self.next
@@ -96,9 +156,13 @@ class End:
 
 
 class Tree:
-    def __init__(self, ref_text=""):
+    def __init__(self, ref_text="", alphabet=None):
+        """ ref_text is stored as character ranks of alphabet, which defaults
+        to the dense alphabet of the characters in ref_text
+        """
         self.root = Node()
-        self.ref_text = ref_text + "$"
+        self.alphabet = Alphabet(ref_text) if alphabet is None else alphabet
+        self.ref_text = self.alphabet.encode(ref_text)
         self.global_end = End(-1)
 
     def get_root(self):
@@ -113,218 +177,861 @@ class Tree:
     def refer(self, ref_index):
         return self.ref_text[ref_index]
 
-    def skip_count(self, active_node, active_length, txt_ptr, txt_end):
-        """ Skips through nodes and edges using using active_length,
-        to return the appropriate pointers to a point in the tree that
-        explicit character comparison needs to begin from
-
-        :param active_node: current active node
-        :param active_length: number of known matching characters that we can skip through;
-                            length defined from the start of the root
-        :param txt_ptr: j
-        :param txt_end: i
-        :return: new active_node, new active edge, index of character to begin explicit comparison
-                in self.ref_text, remaining active_length that is too short to skip through a node
-
-        :time complexity: O(m), where m is the number of nodes of the longest path in the tree
-        :space complexity: O(1)
+    def generate_suffix_array(self):
+        """ Retrieve suffix id from the leaves in pre-order sequence to generate
+        suffix array from the suffix tree
+
+        :time complexity: O(n), where n is the number of nodes in the tree
+        :space complexity: O(l), where l is the number of leaves in the tree
         """
-        n = len(self.ref_text)
-        active_edge = None
-
-        if txt_ptr < n:
-            active_edge = self.get_edge(active_node, txt_ptr)
-
-            if active_edge is not None and active_length >= len(active_edge) and txt_ptr + len(active_edge) <= txt_end:
-                active_length -= len(active_edge)
-                txt_ptr += len(active_edge)
-
-                # while the number of remaining known matching characters is
-                # still sufficient to get skip the entire edge
-                while active_length >= 0 and txt_ptr <= txt_end:
-                    active_node = active_edge.next_node()
-                    active_edge = self.get_edge(active_node, txt_ptr)
-                    if active_edge is None or active_length < len(active_edge):
-                        break
-                    else:
-                        active_length -= len(active_edge)
-                        txt_ptr += len(active_edge)
+        return list(self.iterate_suffix_array())
 
-        return active_node, active_edge, txt_ptr + active_length, active_length
+    def iterate_suffix_array(self):
+        """ Generator version of generate_suffix_array, which yields suffix ids
+        one at a time with an explicit stack instead of recursion, so that
+        deep trees (e.g. long repeats) do not hit the recursion limit
 
-    def traveller(self, catch_up, active_node, active_edge, remaining, txt_ptr):
-        """ Does explicit character comparison while no mismatch is found, traverses through
-        nodes in the way if needed. Incorporates Rule 3 & showstopper.
+        :time complexity: O(n), where n is the number of nodes in the tree
+        :space complexity: O(n) in the worst case for the stack
+        """
+        stack = [self.root]
+        while stack:
+            current = stack.pop()
+            if current.is_leaf():
+                yield current.get_id()
 
-        :param catch_up: Indicates how far j is behind i, used to know when it is ok to increment i
-                        if j catches up to i eventually during explicit character comparison
-        :param active_node: current active node
-        :param active_edge: current active edge
-        :param remaining: The number of characters that can be skipped on the current edge
-        :param txt_ptr: The position to start explicit character comparison in self.ref_text
+            # push children right to left so they are visited left to right
+            for character in sorted(current.edges, reverse=True):
+                stack.append(current.edges[character].next_node())
 
-        :time complexity: O(k), where k is the number of characters left from txt_ptr to the end of self.ref_text
-        :space complexity: O(1)
+    @staticmethod
+    def ukkonen(string, alphabet=None):
+        """ Ukkonen's algorithm to build a suffix tree, with all rules and tricks:
+        Rule 1 via the shared global end, Rule 2 (clean insert / edge break),
+        Rule 3 as the showstopper, skip count and suffix links
+
+        :time complexity: O(n), since each extension either terminates the phase
+        or advances j, and the active point only walks down O(n) edges in total
+        through suffix links, where n is the length of the string
+        :space complexity: O(n), where n is the length of the string,
+        since nodes only store the edges they have
         """
-        n = len(self.ref_text)
-        i = self.global_end
-        mismatch = False
-        reached_node = False  # True if just reached node cannot even find next edge to compare, False otherwise
-        edge_ptr = remaining + active_edge.get_text()[0]
-        total_matched_char = 0  # total number of matching characters during explicit comparison
-        matched_char = 0  # number of matching characters starting from current active node
-
-        while edge_ptr <= i.get_end() and not mismatch and txt_ptr < n:
-            if self.refer(edge_ptr) == self.refer(txt_ptr):
-                reached_node = False
-                edge_ptr += 1
-                txt_ptr += 1
-                matched_char += 1
-
-                # showstopper
-                if txt_ptr > i.get_end() and i.get_end() + 1 < n:
-                    i.increment_end()
-                    catch_up += 1
-
-                # traverse next node if reached the end of the edge
-                if active_edge.get_text()[1].get_end() < edge_ptr <= i.get_end() and txt_ptr < n:
-                    total_matched_char += matched_char
-                    reached_node = True
-                    active_node = active_edge.next_node()
-                    active_edge = self.get_edge(active_node, txt_ptr)
-                    if active_edge is None:
+        suffix_tree = Tree(string, alphabet)
+        root = suffix_tree.get_root()
+        root.set_suffix_link(root)
+        i = suffix_tree.global_end
+        n = len(suffix_tree.ref_text)
+
+        # active point: active_node, the text index of the first character
+        # of the active edge and the number of characters matched along it
+        active_node = root
+        active_edge_index = 0
+        active_length = 0
+        j = 0  # the next suffix to be explicitly inserted
+
+        while i.get_end() + 1 < n:
+            # Rule 1: extend every leaf at once
+            i.increment_end()
+            last_internal = None  # internal node still waiting for a suffix link
+
+            while j <= i.get_end():
+                if active_length == 0:
+                    active_edge_index = i.get_end()
+                active_edge = active_node.get_edge(suffix_tree.refer(active_edge_index))
+
+                if active_edge is None:
+                    # Rule 2: clean insert from the active node
+                    active_node.connect(suffix_tree.refer(i.get_end()), i.get_end(), i, j)
+                    if last_internal is not None:
+                        last_internal.set_suffix_link(active_node)
+                        last_internal = None
+                else:
+                    # skip count: walk down whole edges known to match
+                    if active_length >= len(active_edge):
+                        active_edge_index += len(active_edge)
+                        active_length -= len(active_edge)
+                        active_node = active_edge.next_node()
+                        continue
+
+                    edge_ptr = active_edge.get_text()[0] + active_length
+                    if suffix_tree.refer(edge_ptr) == suffix_tree.refer(i.get_end()):
+                        # Rule 3: showstopper, remaining extensions are implicit
+                        if last_internal is not None:
+                            last_internal.set_suffix_link(active_node)
+                        active_length += 1
                         break
-                    edge_ptr = active_edge.get_text()[0]
-                    matched_char = 0
-            else:
-                mismatch = True
 
-        return txt_ptr, catch_up, active_node, active_edge, matched_char, total_matched_char, reached_node
+                    # Rule 2: break edge where the mismatch occurs
+                    internal_node = active_edge.insert(suffix_tree.refer(edge_ptr), edge_ptr - 1)
+                    internal_node.connect(suffix_tree.refer(i.get_end()), i.get_end(), i, j)
+                    if last_internal is not None:
+                        last_internal.set_suffix_link(internal_node)
+                    last_internal = internal_node
+
+                j += 1
+
+                # move the active point to the next shorter suffix
+                if active_node is root and active_length > 0:
+                    active_length -= 1
+                    active_edge_index = j
+                elif active_node is not root:
+                    active_node = active_node.get_suffix_link()
+
+        return suffix_tree
+
+
+class CompactTree:
+    """ Suffix tree with struct-of-arrays storage, an alternative backend to Tree with the same
+    ukkonen / generate_suffix_array / iterate_suffix_array interface.
+
+    Every node is an index into parallel array('i') columns, and the edge leading into a node
+    is stored on the node itself:
+    edge_start, edge_end: the substring of ref_text on the incoming edge, edge_end is LEAF_END
+                          for leaves, which share the global end (Rule 1)
+    suffix_link: suffix link of internal nodes
+    suffix_id: suffix id of leaves, -1 for internal nodes
+    first_child, next_sibling: children kept as a linked list sorted by first character,
+                               so storage per node does not depend on the alphabet size
+    """
+    LEAF_END = -1
+    NONE = -1
+
+    def __init__(self, ref_text="", alphabet=None):
+        self.alphabet = Alphabet(ref_text) if alphabet is None else alphabet
+        self.text = self.alphabet.encode(ref_text)
+        self.global_end = -1
+
+        self.edge_start = array("i")
+        self.edge_end = array("i")
+        self.suffix_link = array("i")
+        self.suffix_id = array("i")
+        self.first_child = array("i")
+        self.next_sibling = array("i")
+        self.root = self.new_node(0, CompactTree.NONE, CompactTree.NONE)
+
+    def __len__(self):
+        """ Returns the number of nodes in the tree """
+        return len(self.edge_start)
 
-    def generate_suffix_array(self, current=None, suffix_array=None):
+    def get_root(self):
+        return self.root
+
+    def new_node(self, edge_start, edge_end, suffix_id):
+        """ Appends a node without any children to every column and returns its index
+
+        :time complexity: O(1) amortised
+        """
+        self.edge_start.append(edge_start)
+        self.edge_end.append(edge_end)
+        self.suffix_link.append(0)  # root is always node 0
+        self.suffix_id.append(suffix_id)
+        self.first_child.append(CompactTree.NONE)
+        self.next_sibling.append(CompactTree.NONE)
+        return len(self.edge_start) - 1
+
+    def edge_length(self, node):
+        end = self.edge_end[node]
+        if end == CompactTree.LEAF_END:
+            end = self.global_end
+        return end - self.edge_start[node] + 1
+
+    def find_child(self, node, char):
+        """ Returns (previous sibling, child) where child is the child of node whose edge
+        starts with char, or NONE if there is none, in which case previous sibling is
+        where such a child would be linked in to keep the list sorted
+
+        :time complexity: O(c), where c is the number of children of node
+        """
+        previous = CompactTree.NONE
+        child = self.first_child[node]
+        while child != CompactTree.NONE and self.text[self.edge_start[child]] < char:
+            previous = child
+            child = self.next_sibling[child]
+        if child != CompactTree.NONE and self.text[self.edge_start[child]] != char:
+            child = CompactTree.NONE
+        return previous, child
+
+    def link_child(self, node, previous, child):
+        """ Links child into the children of node straight after previous """
+        if previous == CompactTree.NONE:
+            self.next_sibling[child] = self.first_child[node]
+            self.first_child[node] = child
+        else:
+            self.next_sibling[child] = self.next_sibling[previous]
+            self.next_sibling[previous] = child
+
+    def split(self, node, previous, child, length):
+        """ Breaks the edge from node to child after length characters by inserting
+        a new internal node in the middle, and returns the internal node
+
+        :time complexity: O(1)
+        """
+        start = self.edge_start[child]
+        internal_node = self.new_node(start, start + length - 1, CompactTree.NONE)
+
+        # internal node takes the place of child among the children of node
+        if previous == CompactTree.NONE:
+            self.first_child[node] = internal_node
+        else:
+            self.next_sibling[previous] = internal_node
+        self.next_sibling[internal_node] = self.next_sibling[child]
+
+        # child hangs off the internal node with the remaining edge
+        self.edge_start[child] = start + length
+        self.next_sibling[child] = CompactTree.NONE
+        self.first_child[internal_node] = child
+        return internal_node
+
+    def add_leaf(self, node, text_start, suffix_id):
+        """ Rule 2: clean insert of a leaf below node """
+        leaf = self.new_node(text_start, CompactTree.LEAF_END, suffix_id)
+        previous, _ = self.find_child(node, self.text[text_start])
+        self.link_child(node, previous, leaf)
+
+    def generate_suffix_array(self):
         """ Retrieve suffix id from the leaves in pre-order sequence to generate
         suffix array from the suffix tree
 
         :time complexity: O(n), where n is the number of nodes in the tree
         :space complexity: O(l), where l is the number of leaves in the tree
         """
-        if current is None:
-            current = self.root
-            suffix_array = []
-            return self.generate_suffix_array(current, suffix_array)
-        else:
-            if current.is_leaf():
-                suffix_array.append(current.get_id())
+        return array("i", self.iterate_suffix_array())
 
-            for edge in current.edges:
-                if edge is not None:
-                    next_node = edge.next_node()
-                    self.generate_suffix_array(next_node, suffix_array)
-            return suffix_array
+    def iterate_suffix_array(self):
+        """ Yields suffix ids of the leaves in pre-order sequence with an explicit stack
+
+        :time complexity: O(n), where n is the number of nodes in the tree
+        :space complexity: O(n) in the worst case for the stack
+        """
+        stack = [self.root]
+        while stack:
+            current = stack.pop()
+            if self.first_child[current] == CompactTree.NONE:
+                yield self.suffix_id[current]
+                continue
+
+            # push children right to left so they are visited left to right
+            children = []
+            child = self.first_child[current]
+            while child != CompactTree.NONE:
+                children.append(child)
+                child = self.next_sibling[child]
+            children.reverse()
+            stack += children
 
     @staticmethod
-    def ukkonen(string):
-        """ ALMOST ukkonen implementation to build a suffix tree,
-        with all rules and tricks, except suffix links
+    def ukkonen(string, alphabet=None):
+        """ Ukkonen's algorithm with suffix links, as in Tree.ukkonen,
+        but building the struct-of-arrays representation
+
+        :time complexity: O(nc), where n is the length of the string and c is the
+        alphabet size, bounding the sibling list walked on each child lookup
+        :space complexity: O(n), with 6 ints per node
+        """
+        suffix_tree = CompactTree(string, alphabet)
+        text = suffix_tree.text
+        root = suffix_tree.get_root()
+        n = len(text)
+
+        active_node = root
+        active_edge_index = 0
+        active_length = 0
+        j = 0  # the next suffix to be explicitly inserted
+
+        while suffix_tree.global_end + 1 < n:
+            # Rule 1: extend every leaf at once
+            suffix_tree.global_end += 1
+            i = suffix_tree.global_end
+            last_internal = CompactTree.NONE  # internal node still waiting for a suffix link
+
+            while j <= i:
+                if active_length == 0:
+                    active_edge_index = i
+                previous, child = suffix_tree.find_child(active_node, text[active_edge_index])
+
+                if child == CompactTree.NONE:
+                    # Rule 2: clean insert from the active node
+                    leaf = suffix_tree.new_node(i, CompactTree.LEAF_END, j)
+                    suffix_tree.link_child(active_node, previous, leaf)
+                    if last_internal != CompactTree.NONE:
+                        suffix_tree.suffix_link[last_internal] = active_node
+                        last_internal = CompactTree.NONE
+                else:
+                    # skip count: walk down whole edges known to match
+                    edge_length = suffix_tree.edge_length(child)
+                    if active_length >= edge_length:
+                        active_edge_index += edge_length
+                        active_length -= edge_length
+                        active_node = child
+                        continue
+
+                    if text[suffix_tree.edge_start[child] + active_length] == text[i]:
+                        # Rule 3: showstopper, remaining extensions are implicit
+                        if last_internal != CompactTree.NONE:
+                            suffix_tree.suffix_link[last_internal] = active_node
+                        active_length += 1
+                        break
+
+                    # Rule 2: break edge where the mismatch occurs
+                    internal_node = suffix_tree.split(active_node, previous, child, active_length)
+                    suffix_tree.add_leaf(internal_node, i, j)
+                    if last_internal != CompactTree.NONE:
+                        suffix_tree.suffix_link[last_internal] = internal_node
+                    last_internal = internal_node
+
+                j += 1
+
+                # move the active point to the next shorter suffix
+                if active_node == root and active_length > 0:
+                    active_length -= 1
+                    active_edge_index = j
+                elif active_node != root:
+                    active_node = suffix_tree.suffix_link[active_node]
 
-        :time complexity: O(n**2), since i and j outer loops are O(2n)
-        and skip count still loosely bounded by O(n), where n is the length of the string
-        :space complexity: O(nc), where c is the alphabet size of the tree
+        return suffix_tree
+
+
+def sais(string, alphabet=None):
+    """ Builds the suffix array of string directly with SA-IS (suffix array by induced sorting),
+    without building a suffix tree. The terminal symbol $ is appended like in Tree, so the
+    result is identical to Tree.ukkonen(string).generate_suffix_array()
+
+    :time complexity: O(n), where n is the length of the string
+    :space complexity: O(n), stored as array('i') rather than lists of tree nodes
+    """
+    # remap characters to a dense alphabet 1..c, leaving 0 for the terminal symbol
+    alphabet = Alphabet(string) if alphabet is None else alphabet
+    return sais_aux(alphabet.encode(string), len(alphabet))
+
+
+def sais_aux(text, alphabet_size):
+    """ Returns the suffix array of text, an array of integers in the range [0, alphabet_size)
+    that ends with a unique smallest 0. Recurses on the reduced string of LMS substring names
+    when they are not all distinct.
+
+    :time complexity: O(n), where n is the length of text
+    :space complexity: O(n + alphabet_size)
+    """
+    n = len(text)
+    if n == 1:
+        return array("i", [0])
+
+    # classify suffixes: 1 for S-type (smaller than the next suffix), 0 for L-type
+    s_type = bytearray(n)
+    s_type[n - 1] = 1
+    for i in range(n - 2, -1, -1):
+        if text[i] < text[i + 1] or (text[i] == text[i + 1] and s_type[i + 1]):
+            s_type[i] = 1
+
+    # leftmost S-type positions, in text order
+    lms_positions = array("i", [i for i in range(1, n) if s_type[i] and not s_type[i - 1]])
+
+    bucket_sizes = array("i", [0] * alphabet_size)
+    for char in text:
+        bucket_sizes[char] += 1
+
+    # step 1: induced sort with LMS positions in any order sorts the LMS substrings
+    suffix_array = induced_sort(text, s_type, bucket_sizes, lms_positions)
+
+    # step 2: name LMS substrings by rank, equal substrings share a name
+    names = array("i", [-1] * n)
+    name = -1
+    previous = -1
+    for position in suffix_array:
+        if position > 0 and s_type[position] and not s_type[position - 1]:
+            if previous < 0 or not lms_substring_equal(text, s_type, previous, position):
+                name += 1
+            names[position] = name
+            previous = position
+    reduced = array("i", [names[position] for position in lms_positions])
+
+    # step 3: sort the LMS suffixes, recursing only if some names are repeated
+    if name + 1 < len(reduced):
+        reduced_suffix_array = sais_aux(reduced, name + 1)
+    else:
+        reduced_suffix_array = array("i", [0] * len(reduced))
+        for i in range(len(reduced)):
+            reduced_suffix_array[reduced[i]] = i
+
+    # step 4: induced sort from the correctly ordered LMS suffixes
+    sorted_lms = array("i", [lms_positions[i] for i in reduced_suffix_array])
+    return induced_sort(text, s_type, bucket_sizes, sorted_lms)
+
+
+def lms_substring_equal(text, s_type, first, second):
+    """ Returns True if the LMS substrings starting at first and second are equal
+    in both characters and types, False otherwise
+
+    :time complexity: O(k), where k is the length of the shorter LMS substring
+    """
+    n = len(text)
+    k = 0
+    while True:
+        first_lms = k > 0 and s_type[first + k] and not s_type[first + k - 1]
+        second_lms = k > 0 and s_type[second + k] and not s_type[second + k - 1]
+        if first_lms and second_lms:
+            return True
+        if first_lms != second_lms or text[first + k] != text[second + k] \
+                or s_type[first + k] != s_type[second + k]:
+            return False
+        k += 1
+        if first + k >= n or second + k >= n:
+            return False
+
+
+def induced_sort(text, s_type, bucket_sizes, lms_order):
+    """ Places the LMS positions at the tails of their buckets in the order given,
+    then induces L-type suffixes left to right and S-type suffixes right to left
+
+    :time complexity: O(n + alphabet_size)
+    :space complexity: O(n + alphabet_size), where n is the length of text
+    """
+    n = len(text)
+    suffix_array = array("i", [-1] * n)
+
+    tails = bucket_ends(bucket_sizes)
+    for i in range(len(lms_order) - 1, -1, -1):
+        position = lms_order[i]
+        char = text[position]
+        suffix_array[tails[char]] = position
+        tails[char] -= 1
+
+    heads = bucket_starts(bucket_sizes)
+    for i in range(n):
+        position = suffix_array[i] - 1
+        if position >= 0 and not s_type[position]:
+            char = text[position]
+            suffix_array[heads[char]] = position
+            heads[char] += 1
+
+    tails = bucket_ends(bucket_sizes)
+    for i in range(n - 1, -1, -1):
+        position = suffix_array[i] - 1
+        if position >= 0 and s_type[position]:
+            char = text[position]
+            suffix_array[tails[char]] = position
+            tails[char] -= 1
+
+    return suffix_array
+
+
+def bucket_starts(bucket_sizes):
+    """ Returns the first index of each character's bucket in the suffix array """
+    starts = array("i", [0] * len(bucket_sizes))
+    total = 0
+    for char in range(len(bucket_sizes)):
+        starts[char] = total
+        total += bucket_sizes[char]
+    return starts
+
+
+def bucket_ends(bucket_sizes):
+    """ Returns the last index of each character's bucket in the suffix array """
+    ends = array("i", [0] * len(bucket_sizes))
+    total = 0
+    for char in range(len(bucket_sizes)):
+        total += bucket_sizes[char]
+        ends[char] = total - 1
+    return ends
+
+
+def kasai(string, suffix_array):
+    """ Kasai's algorithm, returns the LCP array of string given its suffix array (with the
+    terminal symbol $ at position len(string), as produced by sais or Tree), where
+    lcp_array[k] is the length of the longest common prefix of the suffixes at
+    suffix_array[k - 1] and suffix_array[k], and lcp_array[0] is 0
+
+    :time complexity: O(n), since the matched length drops by at most one per suffix
+    :space complexity: O(n), where n is the length of the string
+    """
+    n = len(suffix_array)
+    rank = inverse_suffix_array(suffix_array)
+    lcp_array = array("i", [0] * n)
+
+    matched = 0
+    for position in range(n):
+        if rank[position] == 0:
+            matched = 0
+            continue
+
+        # the terminal symbol never matches, so comparisons stop at len(string)
+        previous = suffix_array[rank[position] - 1]
+        while position + matched < len(string) and previous + matched < len(string) \
+                and string[position + matched] == string[previous + matched]:
+            matched += 1
+        lcp_array[rank[position]] = matched
+
+        if matched > 0:
+            matched -= 1
+    return lcp_array
+
+
+def inverse_suffix_array(suffix_array):
+    """ Returns the rank array, where rank[suffix_array[k]] = k
+
+    :time complexity: O(n), where n is the length of the suffix array
+    """
+    rank = array("i", [0] * len(suffix_array))
+    for k in range(len(suffix_array)):
+        rank[suffix_array[k]] = k
+    return rank
+
+
+class SparseTable:
+    """ Range minimum query structure, where level k stores the minimum
+    of every window of 2^k values
+    """
+
+    def __init__(self, values):
+        """ Builds all levels of the table from values
+
+        :time complexity: O(n log n)
+        :space complexity: O(n log n), where n is the number of values
+        """
+        self.levels = [array("i", values)]
+        width = 1
+        while 2 * width <= len(values):
+            below = self.levels[-1]
+            self.levels.append(array("i", [min(below[i], below[i + width])
+                                           for i in range(len(below) - width)]))
+            width *= 2
+
+    def query(self, left, right):
+        """ Returns the minimum of values[left..right], both inclusive, from
+        two overlapping windows of the largest power of two that fits
+
+        :time complexity: O(1)
+        """
+        level = (right - left + 1).bit_length() - 1
+        window = self.levels[level]
+        return min(window[left], window[right - (1 << level) + 1])
+
+
+class LcpIndex:
+    """ Answers the longest common prefix of any two suffixes of a string in O(1),
+    from its suffix array, rank array, LCP array and a sparse table over the LCP array
+    """
+
+    def __init__(self, string, suffix_array=None, rmq=True):
+        """ Builds the index, computing the suffix array with sais if it is not given.
+        The rank array and sparse table are only built when rmq is True; otherwise
+        lcp is not available and SuffixArrayIndex queries use plain binary search
+
+        :time complexity: O(n log n), dominated by the sparse table, or O(n) when rmq is False
+        :space complexity: O(n log n), or O(n) when rmq is False, where n is the length of the string
+        """
+        self.string = string
+        self.suffix_array = sais(string) if suffix_array is None else suffix_array
+        self.lcp_array = kasai(string, self.suffix_array)
+        self.rank = self.sparse_table = None
+        if rmq:
+            self.rank = inverse_suffix_array(self.suffix_array)
+            self.sparse_table = SparseTable(self.lcp_array)
+
+    def lcp(self, first, second):
+        """ Returns the length of the longest common prefix of the suffixes
+        starting at positions first and second of the string
+
+        :time complexity: O(1)
+        """
+        if self.sparse_table is None:
+            raise Exception("lcp needs the index to be built or loaded with rmq=True")
+        if first == second:
+            return len(self.string) - first
+        first_rank, second_rank = sorted((self.rank[first], self.rank[second]))
+        return self.sparse_table.query(first_rank + 1, second_rank)
+
+    def longest_repeat(self):
+        """ Returns (start, length) of a longest substring occurring at least twice,
+        where length is 0 if no character repeats
+
+        :time complexity: O(n), where n is the length of the string
+        """
+        best = 0
+        for k in range(1, len(self.lcp_array)):
+            if self.lcp_array[k] > self.lcp_array[best]:
+                best = k
+        return self.suffix_array[best], self.lcp_array[best]
+
+
+class SuffixArrayIndex(LcpIndex):
+    """ Substring queries against a prebuilt suffix array, using binary search
+    accelerated with the LCP of suffixes from the sparse table (when built with rmq=True),
+    so that no character of the pattern is compared more than once per successful step
+    """
+
+    def count(self, pattern, stats=None):
+        """ Returns the number of (possibly overlapping) occurrences of pattern,
+        where stats records the characters compared if given (see match_statistics.py)
+
+        :time complexity: O(m + log n), where m is the length of the pattern
         and n is the length of the string
         """
-        suffix_tree = Tree(string)
-        i = suffix_tree.global_end
-        j = active_length = catch_up = 0  # active_length defined from the root
-        n = len(suffix_tree.ref_text)
+        first, last = self.find_range(pattern, stats)
+        return last - first
 
-        i.increment_end()
-        while i.get_end() < n:
-            while j <= i.get_end() and j < n:
-                active_node = suffix_tree.get_root()
-                active_edge = active_node.get_edge(suffix_tree.refer(j))
-                pseudo_j = j
-                remaining = 0
+    def contains(self, pattern, stats=None):
+        """ Returns True if pattern occurs in the string, False otherwise
 
-                # skip count to locate new character to compare
-                if active_length > 0:
-                    active_node, active_edge, pseudo_j, remaining = suffix_tree.skip_count(active_node, active_length,
-                                                                                           j, i.get_end())
-                    pseudo_j = min(pseudo_j, n - 1)
+        :time complexity: O(m + log n)
+        """
+        return self.count(pattern, stats) > 0
 
-                if active_edge is None:
-                    insert_node = active_node
-                    insert_node_index = min(i.get_end(), pseudo_j, n - 1)
-                    active_length = max(active_length - 1, 0)
-                    catch_up = max(catch_up - 1, 0)
-                else:
-                    # call traveller to compare characters explicitly as far as possible;
-                    # traveller increments i if necessary: Rule 3 + showstopper
-                    last_catch_up = j == i.get_end()
-                    catch_up = 0 if last_catch_up else catch_up - 1
-                    txt_ptr, catch_up, active_node, active_edge, matched_char, total_matched_char, reached_node = \
-                        suffix_tree.traveller(catch_up, active_node, active_edge, remaining, pseudo_j)
-
-                    # Rule 2: break edge if mismatch occurs in the middle of an edge;
-                    # otherwise will be Rule 2: clean insert only
-                    if not reached_node:
-                        # insert internal node in existing edge
-                        old_edge_start = active_edge.get_text()[0]
-                        if matched_char == 0:
-                            old_edge_index = old_edge_start + max(remaining - 1, 0)
-                        else:
-                            old_edge_index = old_edge_start + matched_char - 1
-
-                        internal_node = active_edge.insert(suffix_tree.refer(old_edge_index + 1), old_edge_index)
-                        insert_node = internal_node
-                    else:
-                        insert_node = active_node
-
-                    insert_node_index = min(txt_ptr, n - 1)
-
-                    # update active length
-                    if i.get_end() == j:
-                        active_length = 0
-                    elif last_catch_up and catch_up > 0:
-                        active_length = total_matched_char - 1
-                    # j lags behind i at the start of the iteration
-                    # but then manages to catch up and matches characters exceeding i
-                    elif not last_catch_up and catch_up > 0 and total_matched_char > active_length:
-                        active_length += total_matched_char - 1
-                    else:
-                        active_length = max(active_length - 1, 0)
-
-                # Rule 2: clean insert
-                insert_node.connect(suffix_tree.refer(insert_node_index), insert_node_index, i, j)
-
-                # Rule 1: extend leaf
-                if i.get_end() == j:
-                    i.increment_end()
+    def locate(self, pattern, stats=None):
+        """ Returns the sorted start positions of all occurrences of pattern
 
-                j += 1
+        :time complexity: O(m + log n + k log k), where k is the number of occurrences
+        """
+        first, last = self.find_range(pattern, stats)
+        return sorted(self.suffix_array[first:last])
 
-        i.decrement_end()
-        return suffix_tree
+    def count_batch(self, patterns):
+        """ Returns a list with the count of each pattern in patterns """
+        return [last - first for first, last in self.find_ranges(patterns)]
+
+    def contains_batch(self, patterns):
+        """ Returns a list with True for each pattern in patterns that occurs in the string """
+        return [last > first for first, last in self.find_ranges(patterns)]
+
+    def locate_batch(self, patterns):
+        """ Returns a list with the sorted occurrences of each pattern in patterns """
+        return [sorted(self.suffix_array[first:last]) for first, last in self.find_ranges(patterns)]
+
+    def find_ranges(self, patterns):
+        """ Returns find_range of every pattern in patterns, searching repeated patterns only once
 
+        :time complexity: O(M + q log n), where M is the total length of the distinct
+        patterns and q is the number of distinct patterns
+        """
+        ranges = {}
+        output = []
+        for pattern in patterns:
+            if pattern not in ranges:
+                ranges[pattern] = self.find_range(pattern)
+            output.append(ranges[pattern])
+        return output
+
+    def find_range(self, pattern, stats=None):
+        """ Returns (first, last) such that the suffixes of rank first to last - 1
+        are exactly the suffixes that start with pattern
+
+        :time complexity: O(m + log n)
+        """
+        pattern = self.encode_pattern(pattern)
+        if pattern is None:
+            return 0, 0
+        return self.binary_search(pattern, False, stats), self.binary_search(pattern, True, stats)
+
+    def encode_pattern(self, pattern):
+        """ Returns pattern in the same representation as self.string,
+        or None if it contains characters that cannot occur in it
+        """
+        return pattern
+
+    def save(self, file_name, include_lcp=True):
+        """ Writes the index into file_name in the binary format read by MappedSuffixArrayIndex """
+        save_index(file_name, self.string, self.suffix_array, self.lcp_array if include_lcp else None)
+
+    def binary_search(self, pattern, after_matches, stats=None):
+        """ Returns the first rank whose suffix is greater than pattern. A suffix that
+        starts with pattern counts as greater when after_matches is False (lower bound)
+        and as smaller when after_matches is True (upper bound).
+
+        Keeps the number of characters of pattern matched by the suffixes at both ends
+        of the range. At the middle, the LCP between it and the end with the longer match
+        usually decides the comparison without looking at the text, and otherwise
+        explicit comparison resumes from the longer match.
 
-def ukkonen_driver(file_name):
+        :time complexity: O(m + log n), since explicit comparisons only ever
+        extend the longest known match, or O(m log n) in the worst case without a sparse table
+        """
+        text = self.string
+        m = len(pattern)
+        left, right = -1, len(self.suffix_array)  # virtual sentinels below and above every suffix
+        left_match = right_match = 0
+
+        while right - left > 1:
+            middle = (left + right) // 2
+            if self.sparse_table is None:
+                # without the LCP of suffixes, only the prefix matched at both ends is known
+                known = min(left_match, right_match)
+            elif left_match >= right_match:
+                known = left_match
+                shared = self.sparse_table.query(left + 1, middle) if left >= 0 else 0
+                if shared > known:
+                    left = middle
+                    continue
+                if shared < known:
+                    right, right_match = middle, shared
+                    continue
+            else:
+                known = right_match
+                shared = self.sparse_table.query(middle + 1, right) if right < len(self.suffix_array) else 0
+                if shared > known:
+                    right = middle
+                    continue
+                if shared < known:
+                    left, left_match = middle, shared
+                    continue
+
+            # explicit comparison from the known matched length
+            position = self.suffix_array[middle]
+            matched = known
+            while known < m and position + known < len(text) and text[position + known] == pattern[known]:
+                known += 1
+            if stats is not None:
+                # one per matched character, plus the mismatch unless either string ran out
+                mismatch = 1 if known < m and position + known < len(text) else 0
+                stats.record("comparisons", position + matched, known - matched + mismatch)
+
+            if known == m:
+                pattern_smaller = not after_matches
+            else:
+                pattern_smaller = position + known < len(text) and pattern[known] < text[position + known]
+
+            if pattern_smaller:
+                right, right_match = middle, known
+            else:
+                left, left_match = middle, known
+
+        return right
+
+
+INDEX_MAGIC = b"SUFARRAY"
+INDEX_VERSION = 1
+INDEX_HAS_LCP = 1
+# magic, version, bytes per character, bytes per integer, flags, number of characters
+INDEX_HEADER = struct.Struct("<8sIIIIQ")
+
+
+def save_index(file_name, string, suffix_array=None, lcp_array=None):
+    """ Writes string, its suffix array and optionally its LCP array into file_name as a header
+    followed by fixed width little-endian arrays, each padded to a multiple of 8 bytes:
+    the text as bytes (for byte strings, or if every character fits) or 4 byte code points,
+    then the suffix array and LCP array as int32 (or int64 for texts of 2^31 characters or more)
+
+    :time complexity: O(n), plus O(n) to build the suffix array if it is not given
+    :space complexity: O(n), where n is the length of the string
+    """
+    if suffix_array is None:
+        suffix_array = sais(string)
+    byte_string = not isinstance(string, str)
+    char_width = 1 if byte_string or all(ord(char) < 256 for char in string) else 4
+    int_width = 4 if len(suffix_array) < 2 ** 31 else 8
+    int_type = "i" if int_width == 4 else "q"
+    flags = INDEX_HAS_LCP if lcp_array is not None else 0
+
+    with open(file_name, "wb") as index_file:
+        index_file.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, char_width, int_width, flags, len(string)))
+        if byte_string:
+            write_padded(index_file, bytes(string))
+        elif char_width == 1:
+            write_padded(index_file, string.encode("latin-1"))
+        else:
+            write_padded(index_file, little_endian(array("i", [ord(char) for char in string])))
+        write_padded(index_file, little_endian(array(int_type, suffix_array)))
+        if lcp_array is not None:
+            write_padded(index_file, little_endian(array(int_type, lcp_array)))
+
+
+class MappedSuffixArrayIndex(SuffixArrayIndex):
+    """ SuffixArrayIndex loaded from a file written by save_index. The file is mapped
+    with mmap and the text, suffix array and LCP array are memoryviews into it,
+    so nothing is copied or parsed, and processes mapping the same file share pages
+    """
+
+    def __init__(self, file_name, rmq=False):
+        """ Maps the index file. The rank array and sparse table are only built when rmq
+        is True (this needs the stored LCP array); otherwise queries use plain binary search
+        and lcp is not available
+
+        :time complexity: O(1), or O(n log n) when rmq is True
+        """
+        self.file = MappedFile(file_name)
+        magic, version, char_width, int_width, flags, length = INDEX_HEADER.unpack_from(self.file.buffer)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            self.close()
+            raise Exception(str(file_name) + " is not a suffix array index")
+
+        int_type = "i" if int_width == 4 else "q"
+        offset = INDEX_HEADER.size
+        self.char_width = char_width
+        self.string, offset = self.file.view(offset, length, "B" if char_width == 1 else "i")
+        self.suffix_array, offset = self.file.view(offset, length + 1, int_type)
+        self.lcp_array = None
+        if flags & INDEX_HAS_LCP:
+            self.lcp_array, offset = self.file.view(offset, length + 1, int_type)
+
+        self.rank = self.sparse_table = None
+        if rmq:
+            if self.lcp_array is None:
+                self.close()
+                raise Exception(str(file_name) + " has no LCP array to build the sparse table from")
+            self.rank = inverse_suffix_array(self.suffix_array)
+            self.sparse_table = SparseTable(self.lcp_array)
+
+    def encode_pattern(self, pattern):
+        """ Returns pattern as character codes, comparable to the mapped text """
+        if not isinstance(pattern, str):
+            return bytes(pattern) if self.char_width == 1 else array("i", bytes(pattern))
+        if self.char_width == 1:
+            try:
+                return pattern.encode("latin-1")
+            except UnicodeEncodeError:
+                return None
+        return array("i", [ord(char) for char in pattern])
+
+    def close(self):
+        """ Releases every view into the mapping, then unmaps the file """
+        self.file.close()
+
+
+ENGINES = ("ukkonen", "compact", "sais")
+
+
+def ukkonen_driver(file_name, engine="ukkonen"):
     """ Reads a string from the specified file, then generates a suffix array
-    for it using a suffix_tree and writes it into output_suffix_array.txt
+    for it and writes it into output_suffix_array.txt. The engine is one of
+    "ukkonen", which traverses a suffix tree, "compact", which does the same
+    with the array-backed CompactTree, or "sais", which builds the suffix
+    array directly and can index much larger inputs in the same memory
     """
     with open(file_name) as input_file:
         contents = input_file.read().strip()
 
-    suffix_tree = Tree.ukkonen(contents)
-    suffix_array = suffix_tree.generate_suffix_array()
+    if engine == "ukkonen":
+        # stream suffix ids straight from the tree without materialising the list
+        suffix_array = Tree.ukkonen(contents).iterate_suffix_array()
+    elif engine == "compact":
+        suffix_array = CompactTree.ukkonen(contents).iterate_suffix_array()
+    elif engine == "sais":
+        suffix_array = sais(contents)
+    else:
+        raise Exception("Unknown engine " + str(engine) + ", expected one of " + ", ".join(ENGINES))
 
     with open("output_suffix_array.txt", "w") as output_file:
-        output_file.write(str(suffix_array[0]))
-        for num in range(1, len(suffix_array)):
-            output_file.write("\n" + str(suffix_array[num]))
+        separator = ""
+        for suffix_id in suffix_array:
+            output_file.write(separator + str(suffix_id))
+            separator = "\n"
 
 
-if __name__ == "__main__":
-    filename = sys.argv[1]
-    ukkonen_driver(filename)
+def index_driver(file_name):
+    """ Reads a string from the specified file, then writes its suffix array and
+    LCP array as a binary index into output_suffix_array.idx, which can be
+    loaded without rebuilding through MappedSuffixArrayIndex
+    """
+    with open(file_name) as input_file:
+        contents = input_file.read().strip()
 
+    suffix_array = sais(contents)
+    save_index("output_suffix_array.idx", contents, suffix_array, kasai(contents, suffix_array))
 
 
+if __name__ == "__main__":
+    filename = sys.argv[1]
+    engine_name = sys.argv[2] if len(sys.argv) > 2 else "ukkonen"
+    if engine_name == "index":
+        index_driver(filename)
+    else:
+        ukkonen_driver(filename, engine_name)
@@ -0,0 +1,75 @@
+""" Benchmark for suffix tree construction in suffix_array.py
+
+Times Tree.ukkonen on random lowercase strings of increasing length and reports
+the time per character, which stays roughly constant when construction is linear,
+then compares the memory per node of Tree and the array-backed CompactTree.
+
+Run with the sizes to benchmark as arguments, e.g.
+python suffix_array_benchmark.py 10000 100000 1000000 10000000
+Sizes default to 10^4 - 10^6, since 10^7 characters need several GB of memory
+for the object based tree.
+"""
+
+import gc
+import sys
+import time
+import tracemalloc
+
+from benchmark import random_text
+from suffix_array import CompactTree, Tree
+
+DEFAULT_SIZES = [10 ** 4, 10 ** 5, 10 ** 6]
+
+
+def time_ukkonen(n):
+    """ Returns the number of seconds taken to build the suffix tree
+    of a random string of length n. The cyclic garbage collector is disabled
+    while timing, as timeit does, since its passes over millions of live nodes
+    would otherwise dominate the measurement
+    """
+    text = random_text(n)
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        Tree.ukkonen(text)
+        return time.perf_counter() - start
+    finally:
+        gc.enable()
+
+
+def bytes_per_node(tree_class, n):
+    """ Returns the number of bytes allocated per node when tree_class.ukkonen
+    builds the suffix tree of a random string of length n
+    """
+    text = random_text(n)
+    tracemalloc.start()
+    suffix_tree = tree_class.ukkonen(text)
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    if tree_class is CompactTree:
+        num_nodes = len(suffix_tree)
+    else:
+        num_nodes = 0
+        stack = [suffix_tree.get_root()]
+        while stack:
+            current = stack.pop()
+            num_nodes += 1
+            stack += [edge.next_node() for edge in current.edges.values()]
+    return allocated / num_nodes
+
+
+def ukkonen_benchmark(sizes):
+    """ Prints construction time and time per character for each size in sizes """
+    print("{:>12} {:>12} {:>16}".format("n", "seconds", "microsec/char"))
+    for n in sizes:
+        seconds = time_ukkonen(n)
+        print("{:>12} {:>12.3f} {:>16.3f}".format(n, seconds, seconds / n * 10 ** 6))
+
+    print("{:>12} {:>12}".format("storage", "bytes/node"))
+    for tree_class in (Tree, CompactTree):
+        print("{:>12} {:>12.1f}".format(tree_class.__name__, bytes_per_node(tree_class, min(sizes))))
+
+
+if __name__ == "__main__":
+    ukkonen_benchmark([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
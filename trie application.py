@@ -3,13 +3,21 @@
 This file contains the following classes:
 1) Node, which represents a node in the prefix / suffix trie with relevant information
 2) Trie, which has the following functions:
-__init__, insert_prefix, insert_prefix_aux, build_suffix_trie, search_longest_suffix and sum_lexicographically_less
+__init__, insert_prefix, insert_prefix_aux, build_suffix_trie, search_longest_suffix,
+sum_lexicographically_less, sum_lexicographically_less_batch and save
+3) MappedTrie, a read-only Trie loaded from a file written by Trie.save
+4) SuffixAutomaton, a linear size replacement of the suffix trie for build_from_substrings
 
 More notably, this file contains the functions for the applications of tries:
 1) build_from_substrings(S, T)
 2) alpha_pos(text, query_list)
 """
 
+from array import array
+from bisect import bisect_left
+
+from trie_file import TrieFile, flatten_trie, save_trie
+
 
 class Node:
     """ Represents a node in a prefix / suffix trie with the instance variables:
@@ -17,6 +25,8 @@ class Node:
     self.frequency: the number of words that particular node is a part of
     self.id: the suffix id of a suffix (for suffix tries)
     self.level: the index of a character represented by the node in the given key (for suffix tries)
+    self.less: self.less[j] is the total frequency of the children before link[j] (for prefix tries),
+    kept up to date by Trie.insert_prefix
     """
     def __init__(self, frequency=1, suffix_id=None, lvl=None, size=27):
         """ Initialize node's instance variables
@@ -26,6 +36,7 @@ class Node:
         self.frequency = frequency
         self.id = suffix_id
         self.level = lvl
+        self.less = None
 
 
 class Trie:
@@ -36,6 +47,7 @@ class Trie:
         :complexity: O(1)
         """
         self.root = Node(frequency=0)
+        self.root.less = [0] * len(self.root.link)
 
     def build_suffix_trie(self, key):
         """ Implemented for build_from_substrings
@@ -89,7 +101,7 @@ class Trie:
         Given a key, recursively traverses a prefix tree to insert a key
         by calling insert_prefix_aux
 
-        :complexity: O(K), where K is the length of the key
+        :complexity: O(27 K) = O(K), where K is the length of the key
         """
         current = self.root
         current.frequency += 1
@@ -97,14 +109,19 @@ class Trie:
 
     def insert_prefix_aux(self, key, current, char=0):
         """ Auxiliary function for insert_prefix, which inserts a key recursively
-        into a prefix trie.
+        into a prefix trie, counting it in the less counts of the siblings after it
 
-        :time complexity: O(K), where K is the length of the key
+        :time complexity: O(27 K) = O(K), where K is the length of the key
         """
         if char == len(key) + 1:  # no more characters to insert
             return
         else:
             index = 0 if char == len(key) else ord(key[char]) - 97 + 1
+            # the key is now before every child on the right of index: O(27)
+            if current.less is None:
+                current.less = [0] * len(current.link)
+            for j in range(index + 1, len(current.link)):
+                current.less[j] += 1
             # if node does not exist, create node with default frequency 1 then traverse it
             # otherwise just add its frequency by one then traverse
             if current.link[index] is None:
@@ -125,39 +142,286 @@ class Trie:
         sum_alpha_less = 0
         for i in range(len(key) + 1):
             index = 0 if i == len(key) else ord(key[i]) - 97 + 1
-            # if node exists, add up the left branch frequencies then traverse: O(27)
-            for j in range(index):
-                if current.link[j] is not None:
-                    sum_alpha_less += current.link[j].frequency
+            # if node exists, add up the left branch frequencies then traverse: O(1)
+            sum_alpha_less += current.less[index]
             if current.link[index] is not None:
                 current = current.link[index]
             else:
                 break
         return sum_alpha_less
 
+    def sum_lexicographically_less_batch(self, keys):
+        """ Implemented for alpha_pos
+        Returns sum_lexicographically_less of every key in keys. Keys are answered
+        in sorted order, and each one resumes from the path of the previous key
+        at the end of the prefix they share instead of walking down from the root
+
+        :time complexity: O(Q + K log K), where Q is the total number of characters
+        of the keys not shared with the previous sorted key, and K is the number of keys
+        """
+        output_list = [0] * len(keys)
+        # nodes[i] is the node reached by the first i characters of the previous key,
+        # and sums[i] the frequencies added on the way there
+        nodes = [self.root]
+        sums = [0]
+        previous = ""
+        for k in sorted(range(len(keys)), key=keys.__getitem__):
+            key = keys[k]
+            shared = 0
+            while shared < len(nodes) - 1 and shared < len(key) and key[shared] == previous[shared]:
+                shared += 1
+            del nodes[shared + 1:]
+            del sums[shared + 1:]
+
+            current = nodes[-1]
+            for i in range(shared, len(key) + 1):
+                index = 0 if i == len(key) else ord(key[i]) - 97 + 1
+                sum_alpha_less = sums[-1] + current.less[index]
+                if i == len(key) or current.link[index] is None:
+                    break
+                current = current.link[index]
+                nodes.append(current)
+                sums.append(sum_alpha_less)
+            output_list[k] = sum_alpha_less
+            previous = key
+        return output_list
+
+    def save(self, file_name):
+        """ Writes the trie into file_name in the format of trie_file.py, which MappedTrie loads,
+        with the columns frequency, id, level and the total frequency of the nodes before
+        each node in the file, from which MappedTrie sums the frequencies of siblings
+
+        :time complexity: O(N), where N is the number of nodes in the trie
+        """
+        nodes, first_child, label = flatten_trie(self.root)
+        frequency_before = [0] * len(nodes)
+        running = 0
+        for i in range(len(nodes)):
+            frequency_before[i] = running
+            running += nodes[i].frequency
+        save_trie(file_name, first_child, label, [[node.frequency for node in nodes],
+                                                  [node.id for node in nodes],
+                                                  [node.level for node in nodes],
+                                                  frequency_before])
+
+
+class MappedTrie:
+    """ A read-only Trie loaded from a file written by Trie.save, with the same
+    search_longest_substring and sum_lexicographically_less. The file is mapped rather
+    than read, so loading is O(1) and a query only touches the nodes on its path
+    """
+    FREQUENCY, ID, LEVEL, FREQUENCY_BEFORE = range(4)
+
+    def __init__(self, file_name):
+        """ Maps the trie file
+        :complexity: O(1)
+        """
+        self.file = TrieFile(file_name)
+
+    def search_longest_substring(self, key, char_unread):
+        """ Implemented for build_from_substrings
+        The same as Trie.search_longest_substring, on the mapped suffix trie
+
+        :complexity: O(L), where L is the longest suffix of the suffix trie
+        """
+        current = TrieFile.ROOT
+        start = char_unread
+        while char_unread < len(key):
+            child = self.file.child(current, ord(key[char_unread]) - 97 + 1)
+            # if next character does not exist, current character is the end of the substring
+            if child == -1:
+                break
+            current = child
+            char_unread += 1
+
+        if char_unread == start:
+            return None, None
+        return self.file.value(MappedTrie.ID, current), self.file.value(MappedTrie.LEVEL, current)
+
+    def sum_lexicographically_less(self, key):
+        """ Implemented for alpha_pos
+        The same as Trie.sum_lexicographically_less, on the mapped prefix trie. Siblings are
+        consecutive in the file, so their frequencies are summed from the frequency before them
+
+        :time complexity: O(K), where K is the length of the key
+        """
+        frequency = self.file.columns[MappedTrie.FREQUENCY]
+        frequency_before = self.file.columns[MappedTrie.FREQUENCY_BEFORE]
+        current = TrieFile.ROOT
+        sum_alpha_less = 0
+        for i in range(len(key) + 1):
+            index = 0 if i == len(key) else ord(key[i]) - 97 + 1
+            low, high = self.file.first_child[current], self.file.first_child[current + 1]
+            # the children before index are the ones from the first child to this position
+            position = bisect_left(self.file.label, index, low, high)
+            if position > low:
+                sum_alpha_less += frequency_before[position - 1] + frequency[position - 1] - frequency_before[low]
+            if position == high or self.file.label[position] != index:
+                break
+            current = position
+        return sum_alpha_less
+
+    def close(self):
+        """ Unmaps the file """
+        self.file.close()
+
+
+class SuffixAutomaton:
+    """ Represents the suffix automaton of a key, the smallest automaton accepting every substring
+    of the key, with at most 2K states and 3K transitions for a key of length K.
+    Like CompactTree in suffix_array.py, states and transitions are kept as columns of
+    integer arrays instead of one object each:
+    self.length[s]: the length of the longest substring leading to state s
+    self.link[s]: the suffix link of state s, -1 for the root
+    self.first_end[s]: the index in the key where the first occurrence of the substrings of s ends
+    self.first_edge[s]: the first transition out of state s, -1 if there is none
+    self.edge_char[e], self.edge_target[e], self.edge_next[e]: the character (as ord) and
+    target state of transition e, and the next transition out of the same state
+    """
+
+    def __init__(self, key):
+        """ Builds the suffix automaton of key online, one character at a time
+        :time complexity: O(K), where K is the length of the key (for a fixed size alphabet)
+        """
+        self.length = array("i")
+        self.link = array("i")
+        self.first_end = array("i")
+        self.first_edge = array("i")
+        self.edge_char = array("i")
+        self.edge_target = array("i")
+        self.edge_next = array("i")
+
+        last = self.add_state(0, -1)
+        for i in range(len(key)):
+            last = self.extend(last, ord(key[i]), i)
+
+    def add_state(self, length, first_end, link=-1):
+        """ Appends a state without transitions and returns it
+        :complexity: O(1) armotized
+        """
+        self.length.append(length)
+        self.link.append(link)
+        self.first_end.append(first_end)
+        self.first_edge.append(-1)
+        return len(self.length) - 1
+
+    def add_edge(self, state, char, target):
+        """ Adds a transition from state to target with char
+        :complexity: O(1) armotized
+        """
+        self.edge_char.append(char)
+        self.edge_target.append(target)
+        self.edge_next.append(self.first_edge[state])
+        self.first_edge[state] = len(self.edge_char) - 1
+
+    def find_edge(self, state, char):
+        """ Returns the transition from state with char, -1 if there is none
+        :complexity: O(A), where A is the size of the alphabet
+        """
+        edge = self.first_edge[state]
+        while edge != -1 and self.edge_char[edge] != char:
+            edge = self.edge_next[edge]
+        return edge
+
+    def extend(self, last, char, i):
+        """ Extends the automaton of key[:i], whose whole string leads to last,
+        with the character key[i] and returns the state of key[:i+1]
+        :complexity: O(1) armotized, for a fixed size alphabet
+        """
+        current = self.add_state(self.length[last] + 1, i)
+        # every suffix of key[:i] without a transition with char gets one to the new state
+        previous = last
+        edge = -1
+        while previous != -1:
+            edge = self.find_edge(previous, char)
+            if edge != -1:
+                break
+            self.add_edge(previous, char, current)
+            previous = self.link[previous]
+
+        if previous == -1:
+            self.link[current] = 0
+            return current
+
+        target = self.edge_target[edge]
+        if self.length[previous] + 1 == self.length[target]:
+            self.link[current] = target
+            return current
+
+        # target also holds longer substrings, split off the shorter ones into a clone
+        clone = self.add_state(self.length[previous] + 1, self.first_end[target], self.link[target])
+        edge = self.first_edge[target]
+        while edge != -1:
+            self.add_edge(clone, self.edge_char[edge], self.edge_target[edge])
+            edge = self.edge_next[edge]
+        while previous != -1:
+            edge = self.find_edge(previous, char)
+            if edge == -1 or self.edge_target[edge] != target:
+                break
+            self.edge_target[edge] = clone
+            previous = self.link[previous]
+        self.link[target] = clone
+        self.link[current] = clone
+        return current
+
+    def search_longest_substring(self, key, char_unread):
+        """ Implemented for build_from_substrings
+        The same as Trie.search_longest_substring: returns (substring_start_index, substring_end_index)
+        of the first occurrence of the longest substring starting from the first unread character
+        of key, or (None, None) if that character does not occur at all
+
+        :complexity: O(L), where L is the length of the substring found
+        """
+        state = 0
+        start = char_unread
+        while char_unread < len(key):
+            edge = self.find_edge(state, ord(key[char_unread]))
+            # if next character does not exist, current character is the end of the substring
+            if edge == -1:
+                break
+            state = self.edge_target[edge]
+            char_unread += 1
+
+        if char_unread == start:
+            return None, None
+        # every occurrence of the substrings of a state ends at the same indices
+        end = self.first_end[state]
+        return end - (char_unread - start) + 1, end
+
+
+ENGINES = ("automaton", "trie")
 
-def build_from_substrings(S, T):
+
+def build_from_substrings(S, T, engine="automaton"):
     """ Given two non-empty lowercase strings, S and T, returns a list of
     tuples in the form of (substring_start_index, substring_end_index),
     which represents the smallest set of substrings
     of S that can be concatenated in order to obtain T, False is returned if
     it is not possible
 
-    :time complexity: O(N^2 + M), where N is the number of characters in S
+    The substrings are found with the suffix automaton of S, or with its suffix trie
+    if engine is "trie", which gives the same tuples but takes O(N^2) time and space
+
+    :time complexity: O(N + M), where N is the number of characters in S
     and M is the number of characters in T
     """
     substring_list = []
-    suffix_trie = Trie()
-
-    # build suffix trie: O(N^2)
-    suffix_trie.build_suffix_trie(S)
+    if engine == "trie":
+        # build suffix trie: O(N^2)
+        suffix_index = Trie()
+        suffix_index.build_suffix_trie(S)
+    elif engine == "automaton":
+        # build suffix automaton: O(N)
+        suffix_index = SuffixAutomaton(S)
+    else:
+        raise Exception("Unknown engine " + str(engine) + ", expected one of " + ", ".join(ENGINES))
 
     # starting from the first character, traverse the trie to find the longest
     # possible substring, and repeat this starting from the subsequent first unread
     # character till all substrings are found to form T: O(M)
     char_to_read = 0
     while char_to_read < len(T):
-        start, end = suffix_trie.search_longest_substring(T, char_to_read)
+        start, end = suffix_index.search_longest_substring(T, char_to_read)
         if start is None:  # a character which is in T, but not in S is detected
             return False
         else:
@@ -172,22 +436,19 @@ def alpha_pos(text, query_list):
     integers, where the i-th integer is represents the number of words in text
     which are alphabetically less than query_list[i]
 
-    :time complexity: O(C + Q), where C is the total number of characters in text
-    and Q is the total number of characters in query_list
+    :time complexity: O(C + Q + q log q), where C is the total number of characters in text,
+    Q is the total number of characters in query_list and q is the number of queries
     """
-    # insert all words in text into a prefix trie: O(C)
+    # insert all words in text into a prefix trie: O(27 C) = O(C)
     prefix_trie = Trie()
     for key in text:
         prefix_trie.insert_prefix(key)
 
-    # traverse the trie using keys in the query_list
-    # For every key, for every node that exists, add up all frequencies of nodes
-    # (on the same level) which are lexicographically less than it: O(27 Q) = O(Q)
-    output_list = [0] * len(query_list)
-    index = 0
-    for query in query_list:
-        output_list[index] = prefix_trie.sum_lexicographically_less(query)
-        index += 1
+    # answer the queries in sorted order, so that a query only walks down the part
+    # it does not share with the previous one, adding up all frequencies of nodes
+    # (on the same level) which are lexicographically less than it with the
+    # running sums kept by insert_prefix: O(Q + q log q)
+    output_list = prefix_trie.sum_lexicographically_less_batch(query_list)
     return output_list
 
 
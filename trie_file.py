@@ -0,0 +1,118 @@
+""" Binary file format shared by the tries of trie_template.py and trie application.py,
+so that a trie is built once, saved, and then loaded without inserting every key again.
+
+Nodes are numbered in breadth-first order, so the children of a node are consecutive
+nodes, sorted by their index in the parent's link list ($ = 0, a = 1, b = 2 ......).
+The file is a header followed by little-endian arrays, each padded to a multiple of 8 bytes
+as in mapped_file.py:
+first_child (int32, one per node plus one): the children of node v are nodes
+first_child[v] to first_child[v + 1] - 1
+label (uint8, one per node): the index of the node in its parent's link list
+one int64 column per saved node attribute, where NO_VALUE stands for None
+
+TrieFile maps the file with a MappedFile and reads the arrays through memoryviews,
+so loading takes O(1) time and only the pages of visited nodes are ever read.
+"""
+
+import struct
+from array import array
+from bisect import bisect_left
+
+from mapped_file import MappedFile, little_endian, write_padded
+
+TRIE_MAGIC = b"TRIEFILE"
+TRIE_VERSION = 1
+# magic, version, number of columns, number of nodes, number of terminal ($) nodes
+TRIE_HEADER = struct.Struct("<8sIIQQ")
+NO_VALUE = -2 ** 63
+
+
+def flatten_trie(root):
+    """ Returns (nodes, first_child, label) of the trie below root, where nodes is the list
+    of node objects in breadth-first order, and first_child and label are as stored in the file
+
+    :time complexity: O(27 N), where N is the number of nodes in the trie
+    """
+    nodes = [root]
+    first_child = array("i")
+    label = array("B", [0])
+    for node in nodes:  # nodes grows while it is visited, which makes this breadth-first
+        first_child.append(len(nodes))
+        for i in range(len(node.link)):
+            if node.link[i] is not None:
+                nodes.append(node.link[i])
+                label.append(i)
+    first_child.append(len(nodes))
+    return nodes, first_child, label
+
+
+def save_trie(file_name, first_child, label, columns):
+    """ Writes a trie flattened by flatten_trie into file_name, with columns, a list of
+    lists holding one integer or None per node in the same order
+
+    :time complexity: O(N c), where N is the number of nodes and c the number of columns
+    """
+    with open(file_name, "wb") as trie_file:
+        trie_file.write(TRIE_HEADER.pack(TRIE_MAGIC, TRIE_VERSION, len(columns), len(label), label.count(0) - 1))
+        write_padded(trie_file, little_endian(first_child))
+        write_padded(trie_file, label.tobytes())
+        for column in columns:
+            values = array("q")
+            for value in column:
+                if value is None:
+                    values.append(NO_VALUE)
+                elif isinstance(value, int):
+                    values.append(value)
+                else:
+                    raise Exception(str(value) + " is not an integer, only integer payloads can be saved")
+            write_padded(trie_file, little_endian(values))
+
+
+class TrieFile:
+    """ A trie file written by save_trie, mapped with mmap. Nodes are integers,
+    the root is 0, and nothing is parsed until a node is visited
+    """
+    ROOT = 0
+
+    def __init__(self, file_name):
+        """ Maps the trie file
+        :time complexity: O(1)
+        """
+        self.file = MappedFile(file_name)
+        magic, version, column_count, node_count, terminal_count = TRIE_HEADER.unpack_from(self.file.buffer)
+        if magic != TRIE_MAGIC or version != TRIE_VERSION:
+            self.close()
+            raise Exception(str(file_name) + " is not a trie file")
+
+        self.node_count = node_count
+        self.terminal_count = terminal_count
+        offset = TRIE_HEADER.size
+        self.first_child, offset = self.file.view(offset, node_count + 1, "i")
+        self.label, offset = self.file.view(offset, node_count, "B")
+        self.columns = []
+        for _ in range(column_count):
+            column, offset = self.file.view(offset, node_count, "q")
+            self.columns.append(column)
+
+    def children(self, node):
+        """ Returns the range of the children of node """
+        return range(self.first_child[node], self.first_child[node + 1])
+
+    def child(self, node, index):
+        """ Returns the child of node at index of its link list, -1 if there is none
+        :time complexity: O(log 27) = O(1)
+        """
+        low, high = self.first_child[node], self.first_child[node + 1]
+        position = bisect_left(self.label, index, low, high)
+        if position < high and self.label[position] == index:
+            return position
+        return -1
+
+    def value(self, column, node):
+        """ Returns the value of node in the column-th column, None if it was saved as None """
+        value = self.columns[column][node]
+        return None if value == NO_VALUE else value
+
+    def close(self):
+        """ Releases every view into the mapping, then unmaps the file """
+        self.file.close()
@@ -1,5 +1,13 @@
 """ """
 
+import heapq
+import threading
+from array import array
+from bisect import insort
+
+from trie_file import TrieFile, flatten_trie, save_trie
+
+
 class Node:
     """ A node in the trie """
     
@@ -7,12 +15,16 @@ class Node:
         self.link = [None]*size  # where $ is at index 0
         self.data = data         # data payload
         self.level = level
+        self.frequency = 0       # number of times the key ending here was inserted, for Trie.complete
+        self.best = None         # cached top completions below this node, for Trie.complete
 
 
 class Trie:
-    def __init__(self):
+    def __init__(self, top_k=None):
         self.root = Node(level=0)  # root does not save anything
         self.total_words = 0  # number of unique words stored
+        # if given, every node caches its best top_k completions, kept up to date on insert
+        self.top_k = top_k
 
     def insert(self, key, data=None):
         """ Inserts data into the trie with a corresponding key 
@@ -42,11 +54,16 @@ class Trie:
         # add in payload at the leaf
         # at the end of the for loop, you're at the leaf
         current.data = data
+        current.frequency += 1
+        if self.top_k is not None:
+            self.update_completions(key)
 
     def insert_recurse(self, key, data=None):
         """ Recursive version of insert function """
         current = self.root
         self.insert_recurse_aux(key, data, current)
+        if self.top_k is not None:
+            self.update_completions(key)
 
     def insert_recurse_aux(self, key, data, current, char=0):
         """ Helper function for insert_recurse """
@@ -55,6 +72,7 @@ class Trie:
                 current.link[0] = Node(level=char+1)
                 self.total_words += 1  # if new word is inserted
             current.link[0].data = data
+            current.link[0].frequency += 1
             return
         else:
             next_ind = ord(key[char]) - 97 + 1
@@ -124,23 +142,471 @@ class Trie:
                         self.total_words += 1
                 current = current.link[index]
             current.data = char + 1  # suffix id
+            current.frequency += 1
+            if self.top_k is not None:
+                self.update_completions(key[char:])
 
     def traverse_preorder(self, current=None, data_array=None):
-        """ Retrieve data from the leaves in pre-order sequence
+        """ Retrieve data from the leaves in pre-order sequence, with an explicit stack
+        so that long keys do not hit the recursion limit
         :time complexity: O(N), where N is the number of nodes in the trie
         """
         if current is None:
             current = self.root
             data_array = [0]
-            return self.traverse_preorder(current, data_array)
-        else:
+        stack = [current]
+        while stack:
+            current = stack.pop()
             # visit root first, then from left to right
             if current.data is not None:
                 data_array.append(current.data)
+            # pushed right to left, so that the leftmost child is popped first
+            for i in range(len(current.link) - 1, -1, -1):
+                if current.link[i] is not None:
+                    stack.append(current.link[i])
+        return data_array
 
-            for i in range(len(current.link)):
+    @staticmethod
+    def from_sorted(keys, data=None, top_k=None):
+        """ Builds a trie from keys in sorted order, where data[i] is the payload of keys[i]
+        (None for every key if data is not given). Every key only walks down the prefix
+        it shares with the previous key, which is still on the path, and creates the rest
+        :time complexity: O(T), where T is the total length of the keys,
+        or O(T k) when caching the top k completions
+        """
+        trie = Trie(top_k)
+        path = [trie.root]  # path[i] is the node reached by the first i characters of the previous key
+        previous = ""
+        for k in range(len(keys)):
+            key = keys[k]
+            if key < previous:
+                raise Exception(str(key) + " is not in sorted order. ")
+
+            shared = 0
+            while shared < len(key) and shared < len(previous) and key[shared] == previous[shared]:
+                shared += 1
+            del path[shared + 1:]
+
+            current = path[-1]
+            for i in range(shared, len(key) + 1):
+                # $ = 0, a = 1, b = 2 ......
+                index = 0 if i == len(key) else ord(key[i]) - 97 + 1
+                if current.link[index] is None:
+                    current.link[index] = Node(level=i + 1)
+                    if index == 0:
+                        trie.total_words += 1
+                current = current.link[index]
+                if index != 0:
+                    path.append(current)
+            current.data = None if data is None else data[k]
+            current.frequency += 1
+            if top_k is not None:
+                trie.update_completions(key)
+            previous = key
+        return trie
+
+    def complete(self, prefix, k):
+        """ Returns the k best keys starting with prefix, best first. Keys are ranked by
+        their payload, which should then be a number such as a popularity score, or by the
+        number of times they were inserted if their payload is None, and ties by key.
+        With top_k >= k the answer is cached in the node of the prefix; otherwise every
+        key below it is ranked
+        :time complexity: O(n + k), where n is the length of prefix,
+        or O(n + S + C log k) without the cache, where the subtree of the prefix has
+        S nodes and C keys
+        """
+        current = self.root
+        for i in range(len(prefix)):
+            current = current.link[ord(prefix[i]) - 97 + 1]
+            if current is None:
+                return []
+
+        if self.top_k is not None and k <= self.top_k:
+            return [key for _, key in (current.best or [])[:k]]
+        return [key for _, key in heapq.nsmallest(k, self.completions(current, prefix))]
+
+    def completions(self, current, prefix):
+        """ Yields (-score, key) for every key below current, whose path spells prefix
+        :time complexity: O(S), where S is the number of nodes below current
+        """
+        stack = [(current, prefix)]
+        while stack:
+            current, key = stack.pop()
+            for i in range(1, len(current.link)):
                 if current.link[i] is not None:
-                    self.traverse_preorder(current.link[i], data_array)
-            return data_array
+                    stack.append((current.link[i], key + chr(i - 1 + 97)))
+            if current.link[0] is not None:
+                yield Trie.score(current.link[0]), key
+
+    @staticmethod
+    def score(terminal):
+        """ Returns the rank of the key ending at terminal, negated so that the best sorts first """
+        return -(terminal.data if terminal.data is not None else terminal.frequency)
+
+    def update_completions(self, key):
+        """ Updates the cached top_k completions of every node on the path of key,
+        an existing key whose rank may have changed, from the terminal up to the root
+        :time complexity: O(n k), where n is the length of key
+        """
+        path = [self.root]
+        for i in range(len(key) + 1):
+            index = 0 if i == len(key) else ord(key[i]) - 97 + 1
+            path.append(path[-1].link[index])
+        entry = (Trie.score(path[-1]), key)
+        path[-1].best = [entry]
+
+        for current in reversed(path[:-1]):
+            best = current.best if current.best is not None else []
+            position = 0
+            while position < len(best) and best[position][1] != key:
+                position += 1
+            if position < len(best):
+                old = best.pop(position)
+                if entry > old and len(best) == self.top_k - 1:
+                    # the key got worse and may have been overtaken by one that was cut off,
+                    # the children are already up to date so merge their lists again
+                    candidates = [current.link[i].best for i in range(len(current.link))
+                                  if current.link[i] is not None and current.link[i].best is not None]
+                    current.best = list(heapq.merge(*candidates))[:self.top_k]
+                    continue
+            if len(best) < self.top_k or entry < best[-1]:
+                insort(best, entry)
+                del best[self.top_k:]
+            current.best = best
+
+    def save(self, file_name):
+        """ Writes the trie into file_name in the format of trie_file.py, which MappedTrie loads.
+        Payloads must be integers (or None)
+        :time complexity: O(N), where N is the number of nodes in the trie
+        """
+        nodes, first_child, label = flatten_trie(self.root)
+        save_trie(file_name, first_child, label, [[node.data for node in nodes]])
+
+
+class ConcurrentTrie:
+    """ A Trie that many threads can search while others insert. Readers never lock:
+    they search the published snapshot, a Trie that is never modified again. Writers
+    take turns on a lock, copy only the nodes on the paths of their keys into a new
+    snapshot (sharing every other node with the old one), and then publish it with
+    a single assignment, so a reader sees either all of a batch or none of it
+    """
+
+    def __init__(self):
+        self.current = Trie()  # the published snapshot, replaced but never modified
+        self.write_lock = threading.Lock()
+
+    @property
+    def total_words(self):
+        return self.current.total_words
+
+    def snapshot(self):
+        """ Returns the current snapshot, to run several reads against the same version of the trie.
+        It must not be modified
+        """
+        return self.current
+
+    def search(self, key):
+        """ Searches for a key in the current snapshot and returns payload if found,
+        raises exception otherwise
+        :time complexity: O(n), where n is the length of the key
+        """
+        return self.current.search(key)
+
+    def traverse_preorder(self):
+        """ Retrieve data from the leaves of the current snapshot in pre-order sequence
+        :time complexity: O(N), where N is the number of nodes in the trie
+        """
+        return self.current.traverse_preorder()
+
+    def insert(self, key, data=None):
+        """ Inserts data with a corresponding key, as a batch of one
+        :time complexity: O(n), where n is the length of key
+        """
+        self.insert_batch([(key, data)])
+
+    def insert_batch(self, items):
+        """ Inserts every (key, data) of items and publishes them together as one new snapshot.
+        A node on the path of several keys of the batch is only copied once
+        :time complexity: O(27 T), where T is the total length of the keys
+        """
+        with self.write_lock:
+            old = self.current
+            new = Trie()
+            new.total_words = old.total_words
+            new.root = ConcurrentTrie.copy_node(old.root)
+            copied = {id(new.root)}  # nodes of this batch, not yet visible to readers
+
+            for key, data in items:
+                current = new.root
+                for i in range(len(key) + 1):
+                    # $ = 0, a = 1, b = 2 ......
+                    index = 0 if i == len(key) else ord(key[i]) - 97 + 1
+                    child = current.link[index]
+                    if child is None:
+                        child = Node(level=i + 1)
+                        if index == 0:
+                            new.total_words += 1
+                    elif id(child) not in copied:
+                        # shared with published snapshots, so copy it before modifying
+                        child = ConcurrentTrie.copy_node(child)
+                    else:
+                        current = child
+                        continue
+                    copied.add(id(child))
+                    current.link[index] = child
+                    current = child
+                current.data = data
+                current.frequency += 1
+
+            self.current = new  # publishing is a single assignment, which readers see atomically
+
+    @staticmethod
+    def copy_node(node):
+        """ Returns a copy of node sharing its children """
+        copy = Node(level=node.level, data=node.data, size=0)
+        copy.link = list(node.link)
+        copy.frequency = node.frequency
+        return copy
+
+
+class MappedTrie:
+    """ A read-only Trie loaded from a file written by Trie.save, with the same search and
+    traverse_preorder. The file is mapped rather than read, so loading is O(1) and
+    a query only touches the nodes on its path
+    """
+
+    def __init__(self, file_name):
+        self.file = TrieFile(file_name)
+        self.total_words = self.file.terminal_count  # number of unique words stored
+
+    def search(self, key):
+        """ Searches for a key in the trie and returns payload if found,
+        raises exception otherwise
+        :time complexity: O(n), where n is the length of the key
+        """
+        current = TrieFile.ROOT
+        for i in range(len(key) + 1):
+            # $ = 0, a = 1, b = 2 ......
+            index = 0 if i == len(key) else ord(key[i]) - 97 + 1
+            current = self.file.child(current, index)
+            if current == -1:
+                raise Exception(str(key) + " does not exist. ")
+        return self.file.value(0, current)
+
+    def traverse_preorder(self):
+        """ Retrieve data from the leaves in pre-order sequence
+        :time complexity: O(N), where N is the number of nodes in the trie
+        """
+        data_array = [0]
+        stack = [TrieFile.ROOT]
+        while stack:
+            current = stack.pop()
+            data = self.file.value(0, current)
+            if data is not None:
+                data_array.append(data)
+            stack.extend(reversed(self.file.children(current)))
+        return data_array
+
+    def close(self):
+        """ Unmaps the file """
+        self.file.close()
+
+
+class DoubleArrayTrie:
+    """ A trie with the same insert / search / traverse_preorder interface as Trie,
+    stored as a double array instead of a node object with 27 links per character:
+    a transition from state s with character code c leads to t = base[s] + c,
+    and is valid if check[t] == s. Codes are 1 for $ and 2 - 27 for a - z.
+    A terminal state ($) stores -(i + 1) in base, where i is the index of its payload in values.
+    """
+    ROOT = 1
+    ALPHABET_SIZE = 27
+    MAX_TRIALS = 16  # free slots tried as a base before placing children past every used slot
+
+    def __init__(self):
+        self.base = array("i", [0] * 64)
+        self.check = array("i", [0] * 64)
+        self.check[DoubleArrayTrie.ROOT] = DoubleArrayTrie.ROOT  # occupied, never a valid transition
+        self.values = []
+        self.first_free = 2
+        self.used_end = DoubleArrayTrie.ROOT + 1  # every slot from here onwards is free
+        self.total_words = 0  # number of unique words stored
+
+    @staticmethod
+    def code(key, i):
+        """ Returns the code of the i-th character of key, where the end of key is $ """
+        return 1 if i == len(key) else ord(key[i]) - 97 + 2
+
+    def ensure_size(self, size):
+        """ Grows both arrays to at least size slots, doubling to keep appends amortised O(1) """
+        if size > len(self.base):
+            extra = max(size, 2 * len(self.base)) - len(self.base)
+            self.base.extend(array("i", [0]) * extra)
+            self.check.extend(array("i", [0]) * extra)
+
+    def find_base(self, codes):
+        """ Returns a base such that base + c is free for every code c in codes (in increasing order).
+        The first MAX_TRIALS free slots from the first free one are tried for the first code,
+        then the base is put past the last used slot, so that a search never walks
+        through every hole of a crowded array
+
+        :time complexity: O(T * c + S), where T is MAX_TRIALS, c the number of codes
+        and S the number of occupied slots between the free slots tried
+        """
+        position = self.first_free = self.next_free(self.first_free)
+        for _ in range(DoubleArrayTrie.MAX_TRIALS):
+            self.ensure_size(position + DoubleArrayTrie.ALPHABET_SIZE + 1)
+            base = position - codes[0]
+            if base >= 1 and all(self.check[base + c] == 0 for c in codes):
+                return base
+            position = self.next_free(position + 1)
+
+        base = max(1, self.used_end - codes[0])
+        self.ensure_size(base + DoubleArrayTrie.ALPHABET_SIZE + 1)
+        return base
+
+    def occupy(self, target, state):
+        """ Marks target as a child of state """
+        self.check[target] = state
+        self.used_end = max(self.used_end, target + 1)
+
+    def next_free(self, position):
+        """ Returns the first free slot from position onwards, growing the arrays if there is none """
+        try:
+            return self.check.index(0, position)  # scans in C rather than slot by slot
+        except ValueError:
+            self.ensure_size(len(self.check) + 1)
+            return self.next_free(position)
+
+    def children(self, state):
+        """ Returns the codes of the transitions out of state, in increasing order """
+        base = self.base[state]
+        if base <= 0:
+            return []
+        last = min(base + DoubleArrayTrie.ALPHABET_SIZE, len(self.check) - 1)
+        return [t - base for t in range(base + 1, last + 1) if self.check[t] == state]
+
+    def relocate(self, state, new_code):
+        """ Moves all children of state to a new base where new_code is also free,
+        repointing the check of every grandchild to the child's new position
+
+        :time complexity: O(c^2 + F), where c is the alphabet size and F the cost of find_base
+        """
+        codes = self.children(state)
+        old_base = self.base[state]
+        new_base = self.find_base(sorted(codes + [new_code]))
+        for c in codes:
+            old, new = old_base + c, new_base + c
+            self.base[new] = self.base[old]
+            self.occupy(new, state)
+            for grandchild in self.children(old):
+                self.check[self.base[old] + grandchild] = new
+            # freed slots behind first_free are left alone, find_base only looks ahead of it
+            self.base[old] = self.check[old] = 0
+        self.base[state] = new_base
+
+    def insert(self, key, data=None):
+        """ Inserts data into the trie with a corresponding key, relocating
+        the children of a state when the slot for a new character is taken.
+        For loading many keys at once, from_sorted is faster and packs the arrays tighter
+
+        :time complexity: O(n) transitions, where n is the length of key, plus
+        a find_base for each new state and for each relocation, which moves at most c children
+        """
+        state = DoubleArrayTrie.ROOT
+        for i in range(len(key) + 1):
+            c = DoubleArrayTrie.code(key, i)
+            if self.base[state] == 0:
+                self.base[state] = self.find_base([c])
+            target = self.base[state] + c
+            self.ensure_size(target + 1)
+
+            if self.check[target] != state:
+                if self.check[target] != 0:
+                    self.relocate(state, c)
+                    target = self.base[state] + c
+                self.occupy(target, state)
+                if c == 1:
+                    # if new word is inserted (new state created for '$' at the end)
+                    self.values.append(None)
+                    self.base[target] = -len(self.values)
+                    self.total_words += 1
+            state = target
+
+        # add in payload at the terminal state
+        self.values[-self.base[state] - 1] = data
+
+    def search(self, key):
+        """ Searches for a key in the trie and returns payload if found,
+        raises exception otherwise
+        :time complexity: O(n), where n is the length of the key
+        """
+        state = DoubleArrayTrie.ROOT
+        for i in range(len(key) + 1):
+            base = self.base[state]
+            target = base + DoubleArrayTrie.code(key, i)
+            if base <= 0 or target >= len(self.check) or self.check[target] != state:
+                raise Exception(str(key) + " does not exist. ")
+            state = target
+        return self.values[-self.base[state] - 1]
+
+    def traverse_preorder(self):
+        """ Retrieve data from the leaves in pre-order sequence, as Trie.traverse_preorder does
+        :time complexity: O(N), where N is the number of states in the trie
+        """
+        data_array = [0]
+        stack = [DoubleArrayTrie.ROOT]
+        while stack:
+            state = stack.pop()
+            if self.base[state] < 0:
+                data = self.values[-self.base[state] - 1]
+                if data is not None:
+                    data_array.append(data)
+            else:
+                # push children right to left so they are visited left to right
+                for c in reversed(self.children(state)):
+                    stack.append(self.base[state] + c)
+        return data_array
+
+    @staticmethod
+    def from_sorted(keys, data=None):
+        """ Builds a double array trie from a sorted list of keys, and optionally a list
+        with the payload of each key, placing all children of a state at once so that
+        no state ever needs to be relocated
+
+        :time complexity: O(K + F), where K is the total number of characters in keys
+        and F is the cost of find_base over all states
+        """
+        trie = DoubleArrayTrie()
+        for i in range(1, len(keys)):
+            if keys[i - 1] > keys[i]:
+                raise Exception("keys must be sorted")
+
+        # every state on the stack covers keys[low:high], which share their first depth characters
+        stack = [(DoubleArrayTrie.ROOT, 0, len(keys), 0)]
+        while stack:
+            state, low, high, depth = stack.pop()
+            if low == high:
+                continue
 
+            # sorted keys sharing a prefix are grouped by their next character, with $ first
+            groups = []
+            for i in range(low, high):
+                c = DoubleArrayTrie.code(keys[i], depth)
+                if not groups or groups[-1][0] != c:
+                    groups.append([c, i, i + 1])
+                else:
+                    groups[-1][2] = i + 1
 
+            base = trie.find_base([group[0] for group in groups])
+            trie.base[state] = base
+            for c, group_low, group_high in groups:
+                trie.occupy(base + c, state)
+                if c == 1:
+                    # repeated keys keep the payload of the last one, as repeated inserts do
+                    trie.values.append(None if data is None else data[group_high - 1])
+                    trie.base[base + c] = -len(trie.values)
+                    trie.total_words += 1
+                else:
+                    stack.append((base + c, group_low, group_high, depth + 1))
+        return trie
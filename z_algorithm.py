@@ -1,7 +1,19 @@
-def z_algorithm(string):
+""" Z-algorithm, shared by the boyer_moore package through boyer_moore/z_algo.py
+
+Explicit comparisons extend matches with common_prefix_length, which compares one character
+at a time like the textbook algorithm, and switches to comparing whole blocks of characters
+through slices once BLOCK_SIZE characters have matched, so long matches (e.g. in periodic texts)
+cost a few slice comparisons done in C while short ones pay nothing extra.
+"""
+
+BLOCK_SIZE = 8
+
+
+def z_algorithm(string, stats=None):
     """ Returns a z_array, such that for all i, z_array[i] contains
     the length of the longest substring starting at position i of the
-    string that matches its prefix
+    string that matches its prefix. stats, e.g. a match_statistics.MatchStatistics,
+    records comparisons and Z-box reuses if given
 
     :time complexity: O(n)
     :space complexity: O(n), where n is the length of the string
@@ -14,21 +26,34 @@ def z_algorithm(string):
         # when index is outside the current Z-box
         # explicit comparisons starting from first character
         if index > right:
-            left, right, counter = character_comparison(string, index, left, right, 0)
+            # most positions mismatch straight away, which needs no function call
+            if string[0] != string[index]:
+                counter = 0
+            else:
+                left, right, counter = character_comparison(string, index, left, right, 0)
             z_array[index] = counter
+            if stats is not None:
+                record_comparisons(stats, len(string), index, counter)
         # when index is in the current Z-box
         else:
             remaining = right - index + 1
             reference_index = index - left
             if z_array[reference_index] < remaining:
                 z_array[index] = z_array[reference_index]
+                if stats is not None:
+                    stats.record("z_box_reuse", index)
             elif z_array[reference_index] > remaining:
                 z_array[index] = remaining
+                if stats is not None:
+                    stats.record("z_box_reuse", index)
             else:
                 # explicit comparisons starting from the right + 1
                 number_known_same_char = right - index + 1
-                left, right, counter = character_comparison(string, right + 1, left, right, number_known_same_char)
+                pointer = right + 1
+                left, right, counter = character_comparison(string, pointer, left, right, number_known_same_char)
                 z_array[index] = counter
+                if stats is not None:
+                    record_comparisons(stats, len(string), pointer, counter - number_known_same_char)
         index += 1
 
     return z_array
@@ -43,11 +68,18 @@ def character_comparison(string, pointer, left, right, number_known_same_char):
     :time complexity: O(n);
     :space complexity: O(n), where n is the length of the string
     """
-    counter = number_known_same_char
     start = pointer
+    counter = number_known_same_char
+    # one character at a time, as most matches are short
     while pointer < len(string) and string[counter] == string[pointer]:
         counter += 1
         pointer += 1
+        if pointer - start == BLOCK_SIZE:
+            # a long match, extended by block comparisons
+            matched = common_prefix_length(string, counter, string, pointer)
+            counter += matched
+            pointer += matched
+            break
 
     # redraws the Z-box if its length is greater than 0
     if counter > 0:
@@ -56,3 +88,179 @@ def character_comparison(string, pointer, left, right, number_known_same_char):
             right = pointer - 1
     return left, right, counter
 
+
+def record_comparisons(stats, length, pointer, matched):
+    """ Records the comparisons of an explicit comparison that started at pointer and matched
+    matched characters: one per matched character, plus the mismatch unless it ran off the end
+    of a string of the given length
+    """
+    stats.record("comparisons", pointer, matched + (1 if pointer + matched < length else 0))
+
+
+def common_prefix_length(first, first_start, second, second_start):
+    """ Returns the length of the longest common prefix of first[first_start:] and
+    second[second_start:]. The first BLOCK_SIZE characters are compared one at a time,
+    since most common prefixes are shorter than that. A longer match is then extended
+    by blocks that double in size and narrowed down by halving the block,
+    each step being one slice comparison
+
+    :time complexity: O(k) character comparisons in O(min(k, BLOCK_SIZE) + log k) steps,
+    where k is the length of the common prefix
+    :space complexity: O(k) for the slices
+    """
+    limit = min(len(first) - first_start, len(second) - second_start)
+    short = min(limit, BLOCK_SIZE)
+    length = 0
+    while length < short and first[first_start + length] == second[second_start + length]:
+        length += 1
+    if length < BLOCK_SIZE:
+        return length
+
+    # invariant: the common prefix is at least length and shorter than length + block
+    block = BLOCK_SIZE
+    while length + block <= limit and \
+            first[first_start + length:first_start + length + block] == \
+            second[second_start + length:second_start + length + block]:
+        length += block
+        block *= 2
+
+    while block > 1:
+        block //= 2
+        if length + block <= limit and \
+                first[first_start + length:first_start + length + block] == \
+                second[second_start + length:second_start + length + block]:
+            length += block
+    return length
+
+
+def z_extend(pattern, z_array, text):
+    """ Returns an array where position i contains the length of the longest
+    substring starting at position i of text that matches a prefix of pattern,
+    given z_array = z_algorithm(pattern). This is the second half of the
+    Z-array of pattern + sentinel + text, computed without concatenating them
+
+    :time complexity: O(n + m)
+    :space complexity: O(n), where n is the length of text and m is the length of pattern
+    """
+    return list(iterate_z_extend(pattern, z_array, text))
+
+
+def iterate_z_extend(pattern, z_array, text, stats=None):
+    """ Generator version of z_extend, which yields the values one position at a time,
+    recording comparisons and Z-box reuses into stats if given
+
+    :time complexity: O(n + m)
+    :space complexity: O(1) on top of z_array
+    """
+    left = right = -1  # text[left..right] matches pattern[0..right - left]
+    m = len(pattern)
+    n = len(text)
+    index = 0
+    while index < n:
+        # when index is outside the current Z-box
+        # explicit comparisons starting from the first character of pattern
+        if index > right:
+            counter = 0
+            explicit = True
+        # when index is in the current Z-box
+        else:
+            remaining = right - index + 1
+            reference_index = index - left
+            explicit = False
+            if z_array[reference_index] < remaining:
+                counter = z_array[reference_index]
+            elif z_array[reference_index] > remaining:
+                counter = remaining
+            else:
+                # explicit comparisons starting from the right + 1
+                counter = remaining
+                explicit = True
+            if not explicit and stats is not None:
+                stats.record("z_box_reuse", index)
+
+        if explicit:
+            known = counter
+            # one character at a time, as most matches are short
+            while counter < m and index + counter < n and pattern[counter] == text[index + counter]:
+                counter += 1
+                if counter - known == BLOCK_SIZE:
+                    # a long match, extended by block comparisons
+                    counter += common_prefix_length(pattern, counter, text, index + counter)
+                    break
+            if stats is not None:
+                record_comparisons(stats, min(n, index + m), index + known, counter - known)
+            if counter > 0:
+                left, right = index, index + counter - 1
+        yield counter
+        index += 1
+
+
+def z_match_batch(pattern, texts):
+    """ Returns a list with, for each text in texts, the list of indices where pattern occurs in it.
+    The Z-array of pattern is computed once and reused against every text
+
+    :time complexity: O(m + N), where m is the length of pattern and N is the total length of texts
+    :space complexity: O(m + n), where n is the length of the longest text
+    """
+    z_array = z_algorithm(pattern)
+    return [list(z_match(pattern, text, z_array)) for text in texts]
+
+
+def z_match(pattern, text, z_array=None, stats=None):
+    """ Yields the indices where pattern occurs in text, found as the positions of the
+    Z-array of pattern + sentinel + text whose value is the length of pattern.
+    z_array = z_algorithm(pattern) can be given to reuse it across texts,
+    and stats records comparisons and Z-box reuses if given
+
+    :time complexity: O(n + m), also in the worst case
+    :space complexity: O(m), where n is the length of text and m is the length of pattern
+    """
+    if z_array is None:
+        z_array = z_algorithm(pattern)
+    m = len(pattern)
+    for index, counter in enumerate(iterate_z_extend(pattern, z_array, text, stats)):
+        if counter == m:
+            yield index
+
+
+def prefix_function_from_z(z_array):
+    """ Returns the prefix function of a string from its Z-array, where position i
+    contains the length of the longest proper prefix of string[0..i] that is also its suffix
+
+    :time complexity: O(m)
+    :space complexity: O(m), where m is the length of z_array
+    """
+    prefix_array = [0] * len(z_array)
+    for i in range(1, len(z_array)):
+        # the Z-box at i sets the prefix function of the positions it covers, from its right end
+        # inwards, until a position already set by an earlier (hence longer reaching) Z-box
+        for j in range(z_array[i] - 1, -1, -1):
+            if prefix_array[i + j] > 0:
+                break
+            prefix_array[i + j] = j + 1
+    return prefix_array
+
+
+def z_match_stream(pattern, chunks):
+    """ Online Z-matching over text arriving as an iterable of chunks: yields the index in the
+    whole text of every occurrence of pattern, one character at a time, keeping only the
+    number of characters currently matched. On a mismatch, the match falls back along the
+    prefix function derived from the Z-array of pattern, so no text is ever re-read
+
+    :time complexity: O(n + m), also in the worst case, where n is the total length of the chunks
+    :space complexity: O(m), where m is the length of pattern
+    """
+    prefix_array = prefix_function_from_z(z_algorithm(pattern))
+    m = len(pattern)
+    matched = 0
+    index = 0
+    for chunk in chunks:
+        for char in chunk:
+            while matched > 0 and pattern[matched] != char:
+                matched = prefix_array[matched - 1]
+            if pattern[matched] == char:
+                matched += 1
+            if matched == m:
+                yield index - m + 1
+                matched = prefix_array[matched - 1]
+            index += 1